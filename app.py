@@ -1,15 +1,35 @@
 from flask import Flask, render_template, request
+from werkzeug.middleware.proxy_fix import ProxyFix
 from extensions import db, jwt
 from auth import auth_bp
 from products import products_bp
 from carts import carts_bp
 from orders import orders_bp
 from chat import chat_bp
-from payment import payment_bp
+from payment import confirm_checkout_session, payment_bp
+from metrics import metrics_bp
+from catalog_sync import syncer
+from catalog_export import catalog_exporter
+from catalog_cache import catalog_cache
+from identity import identity_cache
+from passwords import password_hasher
+from search import rebuild_search_index
+from blocklist import token_blocklist
+from ratelimit import auth_limiter
+import cart_store
+from inventory import (
+    INVENTORY_SLOTS,
+    refresh_sharded_inventory,
+    release_expired,
+    reservation_sweeper,
+    shard_product,
+    unshard_product,
+)
 from models import Product
 from dotenv import load_dotenv
+import click
+from datetime import timedelta
 import os
-import json
 
 load_dotenv()
 
@@ -22,9 +42,30 @@ def create_app():
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
+    # Access tokens are short-lived; clients renew them at /auth/refresh
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(
+        minutes=int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", "15"))
+    )
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(
+        days=int(os.getenv("JWT_REFRESH_TOKEN_DAYS", "30"))
+    )
+
+    # Reverse proxies in front of the app, e.g. the edge proxy. Their
+    # X-Forwarded-For is trusted, so request.remote_addr (and the per-IP
+    # auth rate limits keyed on it) is the client's address, not theirs
+    trusted_proxies = int(os.getenv("TRUSTED_PROXIES", "0"))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
+    catalog_cache.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    token_blocklist.init_app(app)
+    auth_limiter.init_app(app)
+    cart_store.init_app(app)
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -33,6 +74,57 @@ def create_app():
     app.register_blueprint(products_bp, url_prefix="/api")
     app.register_blueprint(chat_bp, url_prefix="/ai")
     app.register_blueprint(payment_bp, url_prefix="/payments")
+    app.register_blueprint(metrics_bp, url_prefix="/api")
+
+    @app.cli.command("sync-products")
+    def sync_products_command():
+        """Run one DummyJSON catalog sync and print the result."""
+        print(syncer.run_once())
+
+    @app.cli.command("export-catalog")
+    def export_catalog_command():
+        """Write campaign.json and campaign.json.gz from the products table."""
+        catalog_exporter.export(force=True)
+        print(f"Catalog exported to {catalog_exporter.path}")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """Recreate the product full-text index from the products table."""
+        rebuild_search_index()
+        print("Search index rebuilt")
+
+    @app.cli.command("release-reservations")
+    def release_reservations_command():
+        """Put back the stock of pending orders whose reservation ran out."""
+        print(f"Released {release_expired()} expired reservations")
+        print(f"Refreshed {refresh_sharded_inventory()} sharded stock totals")
+
+    @app.cli.command("shard-inventory")
+    @click.argument("product_id", type=int)
+    @click.option(
+        "--slots", default=INVENTORY_SLOTS, show_default=True, type=click.IntRange(min=1)
+    )
+    def shard_inventory_command(product_id, slots):
+        """Split a hot product's stock across inventory slot rows."""
+        product = db.session.get(Product, product_id)
+        if product is None:
+            raise click.ClickException(f"product {product_id} not found")
+        shard_product(product, slots)
+        db.session.commit()
+        catalog_cache.bump_version()
+        print(f"Product {product_id} stock split into {slots} slots")
+
+    @app.cli.command("unshard-inventory")
+    @click.argument("product_id", type=int)
+    def unshard_inventory_command(product_id):
+        """Fold a product's inventory slots back into a single row."""
+        product = db.session.get(Product, product_id)
+        if product is None:
+            raise click.ClickException(f"product {product_id} not found")
+        unshard_product(product)
+        db.session.commit()
+        catalog_cache.bump_version()
+        print(f"Product {product_id} stock is now {product.inventory}")
 
     @app.route("/")
     def home():
@@ -61,6 +153,10 @@ def create_app():
     @app.route("/order/confirmed")
     def order_confirmed():
         order_id = request.args.get("order_id")
+        # Stripe redirects here with the session it just took payment for
+        session_id = request.args.get("session_id")
+        if session_id:
+            confirm_checkout_session(session_id)
         return render_template("order_confirmed.html", order_id=order_id)
 
     @app.route("/order/failed")
@@ -82,12 +178,20 @@ if __name__ == "__main__":
         db.create_all()
         print("Database tables created")
 
-        products = [product.to_dict() for product in Product.query.all()]
+        catalog_exporter.export()
+        print("Catalog exported to", catalog_exporter.path)
+
+    # Keep the catalog fresh without blocking any request on DummyJSON.
+    # Only the reloader child serves requests, so only it runs the syncer.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Re-export campaign.json whenever a sync changed the catalog
+        syncer.add_listener(catalog_exporter.export)
+        syncer.start(app)
 
-        if os.path.exists("campaign.json"):
-            os.remove("campaign.json")
+        # Write-behind flushes for CART_STORE=memory (no-op for "sql")
+        app.extensions["cart_store"].start(app)
 
-        with open("campaign.json", "w") as f:
-            json.dump(products, f, indent=4)
+        # Return stock held by orders that were never paid
+        reservation_sweeper.start(app)
 
     app.run(host="0.0.0.0", debug=True)
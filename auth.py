@@ -1,13 +1,31 @@
 from flask import Blueprint, jsonify, request
-from werkzeug.security import check_password_hash
-from flask_jwt_extended import create_access_token
-from datetime import timedelta
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    current_user,
+    decode_token,
+    get_jwt,
+    jwt_required,
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from extensions import db
 from models import User
+from identity import identity_cache, token_claims
+from blocklist import token_blocklist
+from passwords import PasswordHasherBusy, needs_rehash
+from ratelimit import auth_limiter
 
 auth_bp = Blueprint("auth", __name__)
 
 
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    resp = jsonify({"error": "too many requests, try again shortly"})
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, 503
+
+
 @auth_bp.route("/register", methods=["POST"])
 def register():
     data = request.get_json() or {}
@@ -45,6 +63,7 @@ def register():
 
 
 @auth_bp.route("/login", methods=["POST"])
+@auth_limiter.limit
 def login():
     data = request.get_json() or {}
 
@@ -55,18 +74,72 @@ def login():
         return jsonify({"error": "username and password required"}), 400
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not user.check_password(password):
         return jsonify({"error": "bad credentials"}), 401
 
-    access_token = create_access_token(
-        identity=email,
-        expires_delta=timedelta(hours=1),
-    )
-
-    return jsonify({"access_token": access_token}), 200
+    # Upgrade hashes made with an older method or cost while we have the
+    # plaintext password
+    if needs_rehash(user.password_hash):
+        user.set_password(password)
+        db.session.commit()
+
+    return jsonify(_issue_tokens(user)), 200
+
+
+def _issue_tokens(user) -> dict:
+    """A short-lived access token plus a refresh token for user."""
+    claims = token_claims(user)
+    return {
+        "access_token": create_access_token(
+            identity=user.email, additional_claims=claims
+        ),
+        "refresh_token": create_refresh_token(
+            identity=user.email, additional_claims=claims
+        ),
+    }
+
+
+@auth_bp.route("/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Trade a refresh token for a new access/refresh pair. No password
+    hashing: just the signature check and the cached token-version lookup.
+    Each refresh token works once; replaying a rotated one returns 401.
+    """
+    token = get_jwt()
+    if not token_blocklist.revoke(token["jti"], token["exp"]):
+        return jsonify({"msg": "Token has been revoked"}), 401
+
+    return jsonify(_issue_tokens(current_user)), 200
+
+
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Revoke the presented token, plus the session's refresh token if the
+    body includes it as {"refresh_token": ...}.
+    """
+    token = get_jwt()
+    token_blocklist.revoke(token["jti"], token["exp"])
+
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    if refresh_token:
+        try:
+            refresh_claims = decode_token(refresh_token)
+        except (JWTExtendedException, PyJWTError):
+            # Already expired or revoked: nothing left to do
+            refresh_claims = None
+
+        if refresh_claims and refresh_claims["sub"] == token["sub"]:
+            token_blocklist.revoke(refresh_claims["jti"], refresh_claims["exp"])
+
+    return jsonify({"message": "logged out"}), 200
 
 
 @auth_bp.route("/forgot-password", methods=["POST"])
+@auth_limiter.limit
 def forgot_password():
     data = request.get_json() or {}
 
@@ -89,6 +162,9 @@ def forgot_password():
         return jsonify({"error": "Security answer is incorrect."}), 401
 
     user.set_password(new_password)
+    # Log out every session that used the old password
+    user.token_version += 1
     db.session.commit()
+    identity_cache.invalidate(user.id)
 
     return jsonify({"message": "Password updated. You can now log in."}), 200
@@ -0,0 +1,98 @@
+"""
+Benchmark catalog sync time against catalog size.
+
+Compares the old one-SELECT-per-product loop with upsert_products() for an
+initial load, an unchanged re-sync and a re-sync where 10% of rows changed.
+
+    python benchmarks/bench_catalog_sync.py [sizes...]
+"""
+import os
+import pathlib
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+
+from app import create_app  # noqa: E402
+from catalog_sync import upsert_products  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Product  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# The per-row loop is too slow to be worth running past this size
+LEGACY_MAX_SIZE = 10_000
+
+
+def make_catalog(size: int, changed_every: int = 0) -> list:
+    return [
+        {
+            "id": i,
+            "title": f"Product {i}",
+            "price": 10 + (i % 100) + (0.5 if changed_every and i % changed_every == 0 else 0),
+            "thumbnail": f"https://cdn.example.com/{i}.webp",
+            "description": f"Description for product {i}",
+            "stock": i % 50,
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+def legacy_sync(remote_products: list) -> None:
+    """The previous fetchApiProducts loop, kept here for comparison."""
+    for p in remote_products:
+        exists = Product.query.filter_by(name=p["title"]).first()
+        if exists:
+            exists.price = p["price"]
+            exists.image_url = p["thumbnail"]
+            exists.description = p["description"]
+            exists.available = True
+            exists.inventory = p["stock"]
+        else:
+            db.session.add(
+                Product(
+                    name=p["title"],
+                    price=p["price"],
+                    image_url=p["thumbnail"],
+                    description=p["description"],
+                    available=True,
+                    inventory=p["stock"],
+                )
+            )
+    db.session.commit()
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run(size: int, sync) -> tuple:
+    db.drop_all()
+    db.create_all()
+    initial = timed(sync, make_catalog(size))
+    unchanged = timed(sync, make_catalog(size))
+    changed = timed(sync, make_catalog(size, changed_every=10))
+    return initial, unchanged, changed
+
+
+def main(sizes: list) -> None:
+    app = create_app()
+    with app.app_context():
+        print(f"{'engine':<8}{'rows':>9}{'initial s':>12}{'unchanged s':>14}{'10% changed s':>16}")
+        for size in sizes:
+            engines = [("bulk", upsert_products)]
+            if size <= LEGACY_MAX_SIZE:
+                engines.insert(0, ("legacy", legacy_sync))
+            for label, sync in engines:
+                initial, unchanged, changed = run(size, sync)
+                print(f"{label:<8}{size:>9}{initial:>12.3f}{unchanged:>14.3f}{changed:>16.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,157 @@
+"""
+Benchmark checkout contention on a single hot product.
+
+Each client thread is its own shopper who adds the product to their cart
+and checks it out through POST /api/orders/from-cart, over and over, while
+the stock runs out. Runs once with the product's stock in its products row
+and once split over inventory slots, and reports for each checkouts/s and
+latency, how many checkouts were turned away for lack of stock (409) or
+failed, and the number of units sold beyond the starting stock (must be 0).
+
+Uses a temporary SQLite file per run so every thread has its own
+connection. SQLite locks the whole database for every write, so slots
+can't let checkouts run in parallel there; the comparison shows the cost
+of the slot bookkeeping. On a database with row locks (e.g. PostgreSQL,
+via SQLALCHEMY_DATABASE_URI) the slots are what remove the hotspot.
+
+    python benchmarks/bench_checkout.py [clients] [attempts] [stock] [slots]
+
+e.g. python benchmarks/bench_checkout.py 16 50 300 8
+"""
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+DB_DIR = tempfile.mkdtemp(prefix="bench-checkout-")
+DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from inventory import shard_product, stock_level  # noqa: E402
+from models import OrderItem, Product  # noqa: E402
+from ratelimit import auth_limiter  # noqa: E402
+
+DEFAULT_CLIENTS = 16
+DEFAULT_ATTEMPTS = 50
+DEFAULT_STOCK = 300
+DEFAULT_SLOTS = 8
+
+PRODUCT_ID = 1
+PASSWORD = "Password123!"
+
+
+def login(client, email: str) -> dict:
+    client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": PASSWORD,
+            "security_question": "q",
+            "security_answer": "a",
+        },
+    )
+    resp = client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+
+
+def run(label: str, clients: int, attempts: int, stock: int, slots: int) -> None:
+    os.environ["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI or (
+        f"sqlite:///{os.path.join(DB_DIR, label + '.db')}"
+    )
+    app = create_app()
+    app.config.update(
+        JWT_SECRET_KEY="bench-secret-" + "x" * 32,
+        PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+    )
+    auth_limiter.enabled = False
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        product = Product(id=PRODUCT_ID, name="Hot Item", price=5, inventory=stock)
+        db.session.add(product)
+        if slots:
+            shard_product(product, slots)
+        db.session.commit()
+
+    shoppers = []
+    for i in range(clients):
+        client = app.test_client()
+        shoppers.append((client, login(client, f"shopper{i}@example.com")))
+
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+
+    def shopper_loop(client, headers):
+        ready.wait()
+        for _ in range(attempts):
+            start = time.perf_counter()
+            client.post("/api/cart", json={"product_id": PRODUCT_ID}, headers=headers)
+            resp = client.post("/api/orders/from-cart", headers=headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(resp.status_code)
+            if resp.status_code == 409:
+                # Sold out; empty the cart so the next attempt is a fresh one
+                client.patch(
+                    "/api/cart",
+                    json={"operations": [{"op": "remove", "product_id": PRODUCT_ID}]},
+                    headers=headers,
+                )
+
+    threads = [threading.Thread(target=shopper_loop, args=s) for s in shoppers]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+
+    with app.app_context():
+        sold = db.session.scalar(
+            db.select(db.func.coalesce(db.func.sum(OrderItem.quantity), 0))
+        )
+        left = stock_level(db.session.get(Product, PRODUCT_ID))
+        db.session.remove()
+        db.engine.dispose()
+
+    ok = statuses.count(201)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label}: clients={clients} attempts={clients * attempts} stock={stock}")
+    print(f"checkouts/s     {ok / total:10.1f}")
+    print(f"p50 ms          {statistics.median(latencies) * 1000:10.1f}")
+    print(f"p95 ms          {p95 * 1000:10.1f}")
+    print(f"sold (201)      {ok:10d}")
+    print(f"sold out (409)  {statuses.count(409):10d}")
+    print(f"failed (5xx)    {sum(1 for s in statuses if s >= 500):10d}")
+    print(f"stock left      {left:10d}")
+    print(f"oversold        {max(sold - stock, 0):10d}")
+    print()
+
+
+def main(clients: int, attempts: int, stock: int, slots: int) -> None:
+    run("single-row", clients, attempts, stock, 0)
+    run(f"sharded-{slots}", clients, attempts, stock, slots)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else DEFAULT_CLIENTS,
+        int(args[1]) if len(args) > 1 else DEFAULT_ATTEMPTS,
+        int(args[2]) if len(args) > 2 else DEFAULT_STOCK,
+        int(args[3]) if len(args) > 3 else DEFAULT_SLOTS,
+    )
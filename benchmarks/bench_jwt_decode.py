@@ -0,0 +1,68 @@
+"""
+Benchmark per-request auth overhead on GET /api/cart with and without the
+JWT decode cache.
+
+    python benchmarks/bench_jwt_decode.py [requests]
+"""
+import os
+import pathlib
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+
+from app import create_app  # noqa: E402
+from extensions import db, jwt  # noqa: E402
+
+DEFAULT_REQUESTS = 5_000
+
+
+def main(requests: int) -> None:
+    app = create_app()
+    app.config.update(
+        JWT_SECRET_KEY="bench-secret-" + "x" * 32,
+        PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+    )
+
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post(
+            "/auth/register",
+            json={
+                "email": "bench@example.com",
+                "password": "Password123!",
+                "security_question": "q",
+                "security_answer": "a",
+            },
+        )
+        token = client.post(
+            "/auth/login",
+            json={"email": "bench@example.com", "password": "Password123!"},
+        ).get_json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{'decode cache':<14}{'req/s':>10}{'us/req':>10}{'hit rate':>10}")
+        for size in (0, 1024):
+            jwt.decode_cache_size = size
+            jwt.clear_decode_cache()
+
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get("/api/cart", headers=headers)
+            elapsed = time.perf_counter() - start
+
+            label = "off" if size == 0 else f"on ({size})"
+            hit_rate = jwt.decode_cache_stats()["hit_rate"]
+            print(
+                f"{label:<14}{requests / elapsed:>10.0f}"
+                f"{elapsed / requests * 1e6:>10.0f}{hit_rate:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS)
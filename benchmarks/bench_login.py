@@ -0,0 +1,97 @@
+"""
+Benchmark /auth/login throughput per core for a given hash method.
+
+Fires logins from a number of client threads at the app and reports
+logins/s, logins/s per pool worker, p50/p95 latency and how many requests
+the hasher turned away with 503.
+
+    python benchmarks/bench_login.py [method] [clients] [logins]
+
+e.g. python benchmarks/bench_login.py pbkdf2:sha256:600000 16 400
+"""
+import os
+import pathlib
+import statistics
+import sys
+import threading
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from passwords import password_hasher  # noqa: E402
+from ratelimit import auth_limiter  # noqa: E402
+
+DEFAULT_METHOD = "scrypt"
+DEFAULT_CLIENTS = 8
+DEFAULT_LOGINS = 200
+
+EMAIL = "bench@example.com"
+PASSWORD = "Password123!"
+
+
+def main(method: str, clients: int, logins: int) -> None:
+    app = create_app()
+    app.config.update(JWT_SECRET_KEY="bench-secret-" + "x" * 32, PASSWORD_HASH_METHOD=method)
+    # Every login comes from one address and account; measure hashing only
+    auth_limiter.enabled = False
+
+    with app.app_context():
+        db.create_all()
+        app.test_client().post(
+            "/auth/register",
+            json={
+                "email": EMAIL,
+                "password": PASSWORD,
+                "security_question": "q",
+                "security_answer": "a",
+            },
+        )
+
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    per_client = logins // clients
+
+    def client_loop():
+        client = app.test_client()
+        for _ in range(per_client):
+            start = time.perf_counter()
+            resp = client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(resp.status_code)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+
+    ok = statuses.count(200)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    workers = password_hasher.workers
+    print(f"method={method} clients={clients} workers={workers} cores={os.cpu_count()}")
+    print(f"logins/s        {ok / total:10.1f}")
+    print(f"logins/s/worker {ok / total / workers:10.1f}")
+    print(f"p50 ms          {statistics.median(latencies) * 1000:10.1f}")
+    print(f"p95 ms          {p95 * 1000:10.1f}")
+    print(f"rejected (503)  {statuses.count(503):10d}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        args[0] if len(args) > 0 else DEFAULT_METHOD,
+        int(args[1]) if len(args) > 1 else DEFAULT_CLIENTS,
+        int(args[2]) if len(args) > 2 else DEFAULT_LOGINS,
+    )
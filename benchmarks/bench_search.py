@@ -0,0 +1,75 @@
+"""
+Benchmark full-text product search latency against catalog size.
+
+    python benchmarks/bench_search.py [sizes...]
+"""
+import os
+import pathlib
+import random
+import sys
+import time
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Product  # noqa: E402
+from search import search_products  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RUNS_PER_QUERY = 50
+
+# Synthetic vocabulary roughly the size of a real product catalog's
+VOCABULARY_SIZE = 20_000
+_vocab_rng = random.Random(0)
+WORDS = [
+    "".join(_vocab_rng.choices("abcdefghijklmnopqrstuvwxyz", k=7))
+    for _ in range(VOCABULARY_SIZE)
+]
+QUERIES = [WORDS[0], f"{WORDS[1]} {WORDS[2]}", WORDS[3][:4], "zzzznomatch"]
+
+
+def load_catalog(size: int) -> None:
+    rng = random.Random(size)
+    rows = [
+        {
+            "name": " ".join(rng.choices(WORDS, k=3)) + f" {i}",
+            "price": 1,
+            "description": " ".join(rng.choices(WORDS, k=20)),
+        }
+        for i in range(size)
+    ]
+    for start in range(0, size, 10_000):
+        db.session.execute(insert(Product), rows[start:start + 10_000])
+    db.session.commit()
+
+
+def main(sizes: list) -> None:
+    app = create_app()
+    with app.app_context():
+        print(f"{'rows':>9}{'query':>18}{'hits':>8}{'avg ms':>10}{'p95 ms':>10}")
+        for size in sizes:
+            db.drop_all()
+            db.create_all()
+            load_catalog(size)
+            for query in QUERIES:
+                hits = len(search_products(query, limit=size))
+                timings = []
+                for _ in range(RUNS_PER_QUERY):
+                    start = time.perf_counter()
+                    search_products(query, limit=20)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                avg = sum(timings) / len(timings)
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(f"{size:>9}{query:>18}{hits:>8}{avg:>10.3f}{p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import RevokedToken
+
+# How often each process re-reads revocations made by other processes
+BLOCKLIST_RELOAD_SECONDS = int(os.getenv("BLOCKLIST_RELOAD_SECONDS", "30"))
+
+# Revocations between sweeps of expired entries
+PURGE_EVERY = 1000
+
+
+class TokenBlocklist:
+    """
+    Revoked JWT ids (jti), each kept only until the token it belongs to
+    expires.
+
+    Checks are a dict lookup against an in-process copy. Revocations are
+    written through to the revoked_tokens table, which is loaded on first
+    use (so they survive restarts) and re-read every
+    BLOCKLIST_RELOAD_SECONDS so revocations made by other workers apply
+    here too.
+    """
+
+    def __init__(self, reload_seconds: int = BLOCKLIST_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._since_purge = 0
+        self._next_reload = 0.0
+
+    def init_app(self, app) -> None:
+        self.reload_seconds = app.config.get(
+            "BLOCKLIST_RELOAD_SECONDS", self.reload_seconds
+        )
+        self.clear()
+
+    def reload(self) -> None:
+        """Replace the in-process copy with the unexpired rows in the table."""
+        rows = db.session.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at).where(
+                RevokedToken.expires_at > datetime.utcnow()
+            )
+        )
+        entries = {jti: _to_timestamp(expires_at) for jti, expires_at in rows}
+        with self._lock:
+            self._entries = entries
+            self._next_reload = time.monotonic() + self.reload_seconds
+
+    def revoke(self, jti: str, expires_at: float) -> bool:
+        """
+        Revoke jti until expires_at (a Unix timestamp). Returns False if it
+        was already revoked, here or by another process, so callers can use
+        it as a one-time claim.
+        """
+        if self.is_revoked(jti):
+            return False
+
+        try:
+            db.session.execute(
+                insert(RevokedToken).values(
+                    jti=jti, expires_at=_from_timestamp(expires_at)
+                )
+            )
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+        with self._lock:
+            self._entries[jti] = expires_at
+            self._since_purge += 1
+            purge = self._since_purge >= PURGE_EVERY
+            if purge:
+                self._since_purge = 0
+
+        if purge:
+            self.purge()
+        return True
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() >= self._next_reload:
+            self.reload()
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def purge(self) -> None:
+        """Drop expired revocations from memory and from the table."""
+        db.session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow())
+        )
+        db.session.commit()
+
+        now = time.time()
+        with self._lock:
+            self._entries = {
+                jti: exp for jti, exp in self._entries.items() if exp > now
+            }
+
+    def clear(self) -> None:
+        """Forget the in-process copy; the next check reloads the table."""
+        with self._lock:
+            self._entries = {}
+            self._since_purge = 0
+            self._next_reload = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# expires_at is stored as naive UTC, like every other timestamp column
+EPOCH = datetime(1970, 1, 1)
+
+
+def _from_timestamp(value: float) -> datetime:
+    return EPOCH + timedelta(seconds=value)
+
+
+def _to_timestamp(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+# Shared blocklist consulted by identity.token_is_revoked
+token_blocklist = TokenBlocklist()
@@ -0,0 +1,544 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import CartItem, Product
+from catalog_cache import catalog_cache
+
+# Which CartStore the app uses: "sql" (default) or "memory"
+CART_STORE = os.getenv("CART_STORE", "sql")
+
+# Seconds between write-behind flushes of the memory store; also the most
+# cart activity a crashed process can lose
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "2"))
+
+# Failed flushes of one user's cart before its pending changes are dropped
+CART_FLUSH_RETRIES = int(os.getenv("CART_FLUSH_RETRIES", "3"))
+
+# Dialects whose insert() supports ON CONFLICT ... DO UPDATE ... RETURNING
+UPSERT_DIALECTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
+def upsert_cart_item(user_id: int, product_id: int, quantity: int):
+    """
+    Add quantity of product_id to the user's cart in a single statement:
+
+        INSERT INTO cart_items (...) SELECT ... FROM products
+        WHERE products.id = :product_id AND products.available
+        ON CONFLICT (user_id, product_id)
+        DO UPDATE SET quantity = cart_items.quantity + excluded.quantity
+        RETURNING ...
+
+    The availability check and the insert-or-increment happen atomically,
+    so concurrent adds of the same product can't trip uq_cart_user_product.
+    Returns the CartItem, or None if the product is missing or unavailable.
+    """
+    dialect_insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if dialect_insert is None:
+        return _add_cart_item_orm(user_id, product_id, quantity)
+
+    source = select(
+        literal(user_id), Product.id, literal(quantity)
+    ).where(Product.id == product_id, Product.available.is_(True))
+
+    statement = dialect_insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity"], source
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + statement.excluded.quantity},
+    ).returning(CartItem)
+
+    return db.session.execute(
+        statement, execution_options={"populate_existing": True}
+    ).scalar_one_or_none()
+
+
+def _add_cart_item_orm(user_id: int, product_id: int, quantity: int):
+    """Read-then-write fallback for databases without ON CONFLICT."""
+    product = db.session.get(Product, product_id)
+    if not product or not product.available:
+        return None
+
+    cart_item = CartItem.query.filter_by(
+        user_id=user_id, product_id=product_id
+    ).first()
+    if cart_item:
+        cart_item.quantity += quantity
+    else:
+        cart_item = CartItem(
+            user_id=user_id, product_id=product_id, quantity=quantity
+        )
+        db.session.add(cart_item)
+    db.session.flush()
+    return cart_item
+
+
+def write_cart_changes(user_id: int, changes: dict) -> None:
+    """
+    Write coalesced cart changes with set-based statements: one DELETE for
+    removals and one executemany upsert each for adds and sets.
+    """
+    removed = [pid for pid, (op, _) in changes.items() if op == "remove"]
+    if removed:
+        db.session.execute(
+            delete(CartItem).where(
+                CartItem.user_id == user_id, CartItem.product_id.in_(removed)
+            )
+        )
+
+    dialect_insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    for op in ("add", "set"):
+        rows = [
+            {"user_id": user_id, "product_id": pid, "quantity": qty}
+            for pid, (change, qty) in changes.items()
+            if change == op
+        ]
+        if not rows:
+            continue
+
+        if dialect_insert is None:
+            _write_cart_rows_orm(rows, increment=op == "add")
+            continue
+
+        statement = dialect_insert(CartItem)
+        new_quantity = statement.excluded.quantity
+        if op == "add":
+            new_quantity = CartItem.quantity + new_quantity
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={"quantity": new_quantity},
+            ),
+            rows,
+        )
+
+
+def _write_cart_rows_orm(rows: list, increment: bool) -> None:
+    """Row-by-row fallback for databases without ON CONFLICT."""
+    for row in rows:
+        cart_item = CartItem.query.filter_by(
+            user_id=row["user_id"], product_id=row["product_id"]
+        ).first()
+        if cart_item is None:
+            db.session.add(CartItem(**row))
+        elif increment:
+            cart_item.quantity += row["quantity"]
+        else:
+            cart_item.quantity = row["quantity"]
+    db.session.flush()
+
+
+class SqlCartStore:
+    """
+    Cart storage straight in the cart_items table: every call is its own
+    committed transaction. flush() has nothing to do.
+
+    Every store implements the same methods. Lines are returned as
+    CartItem.to_dict()-shaped dicts; add() and apply() take changes already
+    validated by the caller.
+    """
+
+    def add(self, user_id: int, product_id: int, quantity: int):
+        """Add quantity to the line, or None if the product is unavailable."""
+        cart_item = upsert_cart_item(user_id, product_id, quantity)
+        if cart_item is None:
+            db.session.rollback()
+            return None
+
+        # Serialize from the RETURNING row before commit expires it
+        line = cart_item.to_dict()
+        db.session.commit()
+        return line
+
+    def apply(self, user_id: int, changes: dict) -> list:
+        """Apply {product_id: (op, quantity)} changes; returns the cart."""
+        write_cart_changes(user_id, changes)
+        lines = self.lines(user_id)
+        db.session.commit()
+        return lines
+
+    def update(self, user_id: int, cart_id: int, quantity: int):
+        """Set a line's quantity, or None if it isn't the user's line."""
+        cart_item = db.session.get(CartItem, cart_id)
+        if not cart_item or cart_item.user_id != user_id:
+            return None
+
+        cart_item.quantity = quantity
+        line = cart_item.to_dict()
+        db.session.commit()
+        return line
+
+    def remove(self, user_id: int, cart_id: int) -> bool:
+        cart_item = db.session.get(CartItem, cart_id)
+        if not cart_item or cart_item.user_id != user_id:
+            return False
+
+        db.session.delete(cart_item)
+        db.session.commit()
+        return True
+
+    def lines(self, user_id: int) -> list:
+        cart_items = CartItem.query.filter_by(user_id=user_id).all()
+        return [cart.to_dict() for cart in cart_items]
+
+    def unavailable(self, product_ids) -> list:
+        """The ids in product_ids that are missing or not available."""
+        available = set(
+            db.session.scalars(
+                select(Product.id).where(
+                    Product.id.in_(product_ids), Product.available.is_(True)
+                )
+            )
+        )
+        return sorted(set(product_ids) - available)
+
+    def flush(self, user_id: int = None) -> None:
+        """Persist pending writes (all users if user_id is None)."""
+
+    def start(self, app) -> None:
+        """Start any background work the store needs."""
+
+    def stats(self) -> dict:
+        return {"store": "sql"}
+
+
+class CartFlushError(Exception):
+    """Raised when a user's pending cart changes couldn't be written."""
+
+
+class _MemoryCart:
+    """One user's cart held by MemoryCartStore."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # product_id -> [cart_items.id, quantity, created_at]; the id and
+        # created_at are None only while a new line is being written
+        self.lines = None
+        # product_id -> quantity in cart_items when the cart was loaded
+        self.base = {}
+        # Lines set or removed outright; other dirty lines only grew by adds
+        self.absolute = set()
+        self.dirty = set()
+        self.evicted = False
+        self.failures = 0
+
+
+class MemoryCartStore(SqlCartStore):
+    """
+    Write-behind cart store: add/update/remove/apply change an in-process
+    copy of the user's cart and are written to cart_items later, coalesced
+    into one transaction per user.
+
+    Guarantees:
+    - Read-your-writes: every read path (cart listing, checkout) calls
+      flush(user_id) first, and all writes for a user are serialized.
+    - Same lines as SqlCartStore: a write that creates a line flushes the
+      cart at once, so every returned line has the id update() and
+      remove() address it by. Only changes to existing lines, like
+      repeated adds of the same product, wait for the next flush.
+    - Bounded loss: a background thread flushes every CART_FLUSH_INTERVAL
+      seconds (and at exit), so a crash loses at most that much activity.
+    - A failed flush is rolled back and raises CartFlushError; the changes
+      stay in memory for the next flush. After CART_FLUSH_RETRIES failures
+      they are logged and dropped so one bad cart can't retry forever.
+
+    A user's cart is loaded with one SELECT on their first write after a
+    flush and dropped from memory once flushed. Carts live in one process,
+    so run a single worker (or route each user to the same one).
+    """
+
+    def __init__(
+        self,
+        interval: float = CART_FLUSH_INTERVAL,
+        retries: int = CART_FLUSH_RETRIES,
+    ):
+        self.interval = interval
+        self.retries = retries
+        self.flushes = 0
+        self.dropped = 0
+        self._carts = {}
+        self._lock = threading.Lock()
+        self._availability = {}
+        self._availability_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def _cart(self, user_id: int):
+        """Yield the user's cart, loaded and locked."""
+        while True:
+            with self._lock:
+                cart = self._carts.setdefault(user_id, _MemoryCart())
+            cart.lock.acquire()
+            if not cart.evicted:
+                break
+            # Flushed and dropped while we waited; start from a fresh copy
+            cart.lock.release()
+
+        try:
+            if cart.lines is None:
+                self._load(user_id, cart)
+            yield cart
+        finally:
+            cart.lock.release()
+
+    @staticmethod
+    def _load(user_id: int, cart: _MemoryCart) -> None:
+        rows = db.session.execute(
+            select(
+                CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.created_at
+            ).where(CartItem.user_id == user_id)
+        )
+        cart.lines = {pid: [cid, qty, created] for cid, pid, qty, created in rows}
+        cart.base = {pid: entry[1] for pid, entry in cart.lines.items()}
+        cart.absolute.clear()
+
+    @staticmethod
+    def _line(user_id: int, product_id: int, entry: list) -> dict:
+        return {
+            "id": entry[0],
+            "user_id": user_id,
+            "product_id": product_id,
+            "quantity": entry[1],
+            "created_at": entry[2].isoformat() if entry[2] else None,
+        }
+
+    def _write_new_lines(self, user_id: int, cart: _MemoryCart) -> None:
+        """Flush the cart and reload it if it has lines without an id yet."""
+        if any(entry[0] is None for entry in cart.lines.values()):
+            self._write(user_id, cart)
+            self._load(user_id, cart)
+
+    def add(self, user_id: int, product_id: int, quantity: int):
+        if self.unavailable([product_id]):
+            return None
+
+        with self._cart(user_id) as cart:
+            entry = cart.lines.setdefault(product_id, [None, 0, None])
+            entry[1] += quantity
+            cart.dirty.add(product_id)
+            self._write_new_lines(user_id, cart)
+            entry = cart.lines.get(product_id)
+            if entry is None:
+                # Its write failed too often and was dropped
+                raise CartFlushError(f"cart of user {user_id} not saved")
+            return self._line(user_id, product_id, entry)
+
+    def apply(self, user_id: int, changes: dict) -> list:
+        with self._cart(user_id) as cart:
+            for product_id, (op, quantity) in changes.items():
+                if op != "add":
+                    cart.absolute.add(product_id)
+                if op == "remove":
+                    cart.lines.pop(product_id, None)
+                else:
+                    entry = cart.lines.setdefault(product_id, [None, 0, None])
+                    entry[1] = entry[1] + quantity if op == "add" else quantity
+                cart.dirty.add(product_id)
+
+            self._write_new_lines(user_id, cart)
+            return [
+                self._line(user_id, pid, entry)
+                for pid, entry in cart.lines.items()
+            ]
+
+    def _find(self, cart: _MemoryCart, cart_id: int):
+        for product_id, entry in cart.lines.items():
+            if entry[0] == cart_id:
+                return product_id, entry
+        return None, None
+
+    def update(self, user_id: int, cart_id: int, quantity: int):
+        with self._cart(user_id) as cart:
+            product_id, entry = self._find(cart, cart_id)
+            if entry is None:
+                return None
+
+            entry[1] = quantity
+            cart.absolute.add(product_id)
+            cart.dirty.add(product_id)
+            return self._line(user_id, product_id, entry)
+
+    def remove(self, user_id: int, cart_id: int) -> bool:
+        with self._cart(user_id) as cart:
+            product_id, entry = self._find(cart, cart_id)
+            if entry is None:
+                return False
+
+            del cart.lines[product_id]
+            cart.absolute.add(product_id)
+            cart.dirty.add(product_id)
+            return True
+
+    def lines(self, user_id: int) -> list:
+        self.flush(user_id)
+        return super().lines(user_id)
+
+    def unavailable(self, product_ids) -> list:
+        """
+        Like SqlCartStore.unavailable, but availability is remembered until
+        the catalog changes, so repeat adds don't touch the products table.
+        """
+        version = catalog_cache.version
+        with self._lock:
+            if version != self._availability_version:
+                self._availability = {}
+                self._availability_version = version
+            # A concurrent reset swaps in a new dict; keep using this one
+            availability = self._availability
+
+        unknown = [pid for pid in product_ids if pid not in availability]
+        if unknown:
+            missing = set(super().unavailable(unknown))
+            for pid in unknown:
+                availability[pid] = pid not in missing
+
+        return sorted(pid for pid in product_ids if not availability[pid])
+
+    def flush(self, user_id: int = None) -> None:
+        if user_id is None:
+            with self._lock:
+                user_ids = list(self._carts)
+            for uid in user_ids:
+                try:
+                    self.flush(uid)
+                except CartFlushError as e:
+                    # Keep going; one bad cart mustn't hold up the others
+                    print("Cart flush failed:", e)
+            return
+
+        with self._lock:
+            cart = self._carts.get(user_id)
+        if cart is None:
+            return
+
+        with cart.lock:
+            if cart.evicted:
+                return
+
+            self._write(user_id, cart)
+
+            # Drop the copy; the next write reloads it with the new row ids
+            cart.evicted = True
+            with self._lock:
+                if self._carts.get(user_id) is cart:
+                    del self._carts[user_id]
+
+    def _write(self, user_id: int, cart: _MemoryCart) -> None:
+        """
+        Write the cart's pending changes in one transaction. The caller
+        holds cart.lock. Lines that only grew are written as increments,
+        so a line checked out meanwhile isn't restored with its old
+        quantity; lines set or removed are written as such.
+
+        On failure the transaction is rolled back and CartFlushError
+        raised, keeping the changes, until the cart has failed
+        self.retries times; then they are logged and dropped.
+        """
+        if not cart.dirty:
+            return
+
+        changes = {}
+        for product_id in cart.dirty:
+            entry = cart.lines.get(product_id)
+            if entry is None or entry[1] <= 0:
+                changes[product_id] = ("remove", 0)
+            elif product_id in cart.absolute:
+                changes[product_id] = ("set", entry[1])
+            else:
+                # Write only what was added, not the total: the row may have
+                # changed since the cart was loaded (e.g. checkout deleted it)
+                added = entry[1] - cart.base.get(product_id, 0)
+                changes[product_id] = ("add", added)
+        try:
+            write_cart_changes(user_id, changes)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            cart.failures += 1
+            if cart.failures < self.retries:
+                raise CartFlushError(f"cart of user {user_id} not saved: {e}") from e
+            print(
+                f"Dropping cart changes of user {user_id} after "
+                f"{cart.failures} failed flushes: {changes}: {e}"
+            )
+            self.dropped += 1
+        else:
+            self.flushes += 1
+        cart.dirty.clear()
+        cart.failures = 0
+
+    def pending(self) -> int:
+        """Users with writes not yet in cart_items."""
+        with self._lock:
+            carts = list(self._carts.values())
+        return sum(1 for cart in carts if cart.dirty)
+
+    def stats(self) -> dict:
+        return {
+            "store": "memory",
+            "interval": self.interval,
+            "pending": self.pending(),
+            "flushes": self.flushes,
+            "dropped": self.dropped,
+        }
+
+    def start(self, app) -> None:
+        """Flush every interval from a daemon thread, and once more at exit."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(app,), name="cart-flush", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self._flush_in, app)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _flush_in(self, app) -> None:
+        with app.app_context():
+            self.flush()
+
+    def _loop(self, app) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._flush_in(app)
+            except Exception as e:
+                print("Cart flush failed:", e)
+
+
+def init_app(app) -> None:
+    """Pick the app's cart store from CART_STORE ("sql" or "memory")."""
+    kind = app.config.get("CART_STORE", CART_STORE)
+    if kind == "memory":
+        store = MemoryCartStore(
+            app.config.get("CART_FLUSH_INTERVAL", CART_FLUSH_INTERVAL),
+            app.config.get("CART_FLUSH_RETRIES", CART_FLUSH_RETRIES),
+        )
+    elif kind == "sql":
+        store = SqlCartStore()
+    else:
+        raise ValueError(f"unknown CART_STORE: {kind}")
+    app.extensions["cart_store"] = store
+
+
+def get_cart_store():
+    """The current app's cart store."""
+    return current_app.extensions["cart_store"]
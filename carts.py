@@ -1,23 +1,124 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy import func, select
 from extensions import db
-from models import CartItem, Product, User
+from models import CartItem, Product
+from catalog_cache import catalog_cache
+from cart_store import get_cart_store
 
 carts_bp = Blueprint("cart", __name__, url_prefix="/api")
 
+# Max operations accepted by one PATCH /api/cart
+MAX_CART_OPERATIONS = 100
+
+
+def _parse_cart_operations(data) -> dict:
+    """
+    Validate a PATCH /api/cart body and fold its operations, in order, into
+    one final change per product: ("add", q), ("set", q) or ("remove", 0).
+    Raises ValueError with a user-facing message on the first bad operation.
+    """
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > MAX_CART_OPERATIONS:
+        raise ValueError(f"at most {MAX_CART_OPERATIONS} operations per request")
+
+    changes = {}
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"operations[{i}]: must be an object")
+
+        op = operation.get("op")
+        if op not in ("add", "set", "remove"):
+            raise ValueError(f"operations[{i}]: op must be add, set or remove")
+
+        try:
+            product_id = int(operation.get("product_id"))
+        except (TypeError, ValueError):
+            raise ValueError(f"operations[{i}]: invalid product_id")
+
+        quantity = 0
+        if op != "remove":
+            try:
+                quantity = int(operation.get("quantity", 1))
+            except (TypeError, ValueError):
+                raise ValueError(f"operations[{i}]: quantity should be integer")
+            if quantity <= 0:
+                raise ValueError(f"operations[{i}]: quantity must be > 0")
+
+        previous, previous_qty = changes.get(product_id, (None, 0))
+        if op == "add" and previous == "set":
+            changes[product_id] = ("set", previous_qty + quantity)
+        elif op == "add" and previous == "add":
+            changes[product_id] = ("add", previous_qty + quantity)
+        elif op == "add" and previous == "remove":
+            changes[product_id] = ("set", quantity)
+        else:
+            changes[product_id] = (op, quantity)
+
+    return changes
+
+
+def _expanded_cart(user_id: int) -> dict:
+    """
+    The user's cart with product name, price and image per line, line
+    totals, and the cart subtotal and item count, all from one JOIN query
+    (the totals are window sums over the same rows).
+    """
+    line_total = CartItem.quantity * Product.price
+    statement = (
+        select(
+            CartItem,
+            Product.name,
+            Product.price,
+            Product.image_url,
+            Product.available,
+            line_total.label("line_total"),
+            func.sum(line_total).over().label("subtotal"),
+            func.sum(CartItem.quantity).over().label("item_count"),
+        )
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    )
+
+    items = []
+    subtotal = 0
+    item_count = 0
+    for row in db.session.execute(statement):
+        item = row.CartItem.to_dict()
+        item["product"] = None
+        item["line_total"] = 0.0
+        if row.name is not None:
+            item["product"] = {
+                "name": row.name,
+                "price": float(row.price),
+                "image_url": row.image_url,
+                "available": row.available,
+            }
+            item["line_total"] = round(float(row.line_total), 2)
+        items.append(item)
+        subtotal = row.subtotal or 0
+        item_count = row.item_count or 0
+
+    return {
+        "items": items,
+        "subtotal": round(float(subtotal), 2),
+        "item_count": int(item_count),
+    }
+
 
 # GET /api/cart  – list current user's cart
 @carts_bp.route("/cart", methods=["GET"])
 @jwt_required()
 def list_cart():
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-
-    if not user:
-        return jsonify({"error": "user not found"}), 404
+    store = get_cart_store()
+    if request.args.get("expand") == "product":
+        store.flush(current_user.id)
+        return jsonify(_expanded_cart(current_user.id)), 200
 
-    cart_items = CartItem.query.filter_by(user_id=user.id).all()
-    return jsonify([cart.to_dict() for cart in cart_items]), 200
+    return jsonify(store.lines(current_user.id)), 200
 
 
 # POST /api/cart  – add product to cart
@@ -46,77 +147,87 @@ def add_to_cart():
     except (TypeError, ValueError):
         return jsonify({"error": "invalid product_id"}), 400
 
-    product = Product.query.get(product_id_int)
-
-    # If product not found in DB, create it from frontend (DummyJSON) data
-    if not product:
-        name = data.get("name")
-        price = data.get("price")
-        image_url = data.get("image_url")
-        description = data.get("description", "")
-
-        if not name or price is None:
-            return jsonify({"error": "product not found"}), 404
-
-        try:
-            price = float(price)
-        except (TypeError, ValueError):
-            return jsonify({"error": "invalid price"}), 400
-
-        product = Product(
-            id=product_id_int,
-            name=name,
-            price=price,
-            image_url=image_url,
-            description=description,
-            available=True,
-            inventory=0,
-        )
-        db.session.add(product)
-        db.session.flush()
-
-    if not product.available:
-        return jsonify({"error": "product not available"}), 400
-
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-
-    if not user:
-        return jsonify({"error": "user not found"}), 404
+    store = get_cart_store()
+    line = store.add(current_user.id, product_id_int, quantity)
+
+    if line is None:
+        # Nothing was written: the product is missing or not available
+        product = Product.query.get(product_id_int)
+
+        # If product not found in DB, create it from frontend (DummyJSON) data
+        if not product:
+            name = data.get("name")
+            price = data.get("price")
+            image_url = data.get("image_url")
+            description = data.get("description", "")
+
+            if not name or price is None:
+                return jsonify({"error": "product not found"}), 404
+
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                return jsonify({"error": "invalid price"}), 400
+
+            product = Product(
+                id=product_id_int,
+                name=name,
+                price=price,
+                image_url=image_url,
+                description=description,
+                available=True,
+                # Nothing from the client is trusted for checkout: with no
+                # stock it can be carted but not bought until synced
+                inventory=0,
+                placeholder=True,
+            )
+            db.session.add(product)
+            db.session.commit()
+            catalog_cache.bump_version()
+
+        if not product.available:
+            return jsonify({"error": "product not available"}), 400
+
+        line = store.add(current_user.id, product_id_int, quantity)
+
+    return jsonify(line), 201
+
+
+# PATCH /api/cart  – apply many add/set/remove operations at once
+@carts_bp.route("/cart", methods=["PATCH"])
+@jwt_required()
+def patch_cart():
+    """
+    Body: {"operations": [{"op": "add" | "set" | "remove",
+                           "product_id": 1, "quantity": 2}, ...]}
+
+    Every operation is validated before anything is written; operations on
+    the same product are folded together in order. The changes are applied
+    in a single transaction and the resulting cart is returned.
+    """
+    try:
+        changes = _parse_cart_operations(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    cart_item = CartItem.query.filter_by(
-        user_id=user.id, product_id=product_id
-    ).first()
+    store = get_cart_store()
 
-    if cart_item:
-        cart_item.quantity += quantity
-    else:
-        cart_item = CartItem(
-            user_id=user.id,
-            product_id=product_id,
-            quantity=quantity,
-        )
-        db.session.add(cart_item)
+    # Lines being added or set must point at available products
+    wanted = [pid for pid, (op, _) in changes.items() if op != "remove"]
+    if wanted:
+        unavailable = store.unavailable(wanted)
+        if unavailable:
+            return jsonify(
+                {"error": "products not available", "product_ids": unavailable}
+            ), 400
 
-    db.session.commit()
-    return jsonify(cart_item.to_dict()), 201
+    return jsonify(store.apply(current_user.id, changes)), 200
 
 
 # PUT /api/cart/<cart_id>  – update quantity
 @carts_bp.route("/cart/<int:cart_id>", methods=["PUT"])
 @jwt_required()
 def update_cart(cart_id: int):
-    cart_item = CartItem.query.get(cart_id)
-
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
-    if not cart_item or cart_item.user_id != user.id:
-        return jsonify({"error": "not found"}), 404
-
     data = request.get_json() or {}
 
     if "quantity" not in data:
@@ -130,26 +241,18 @@ def update_cart(cart_id: int):
     if new_qty <= 0:
         return jsonify({"error": "quantity must be > 0"}), 400
 
-    cart_item.quantity = new_qty
-    db.session.commit()
-    return jsonify(cart_item.to_dict()), 200
+    line = get_cart_store().update(current_user.id, cart_id, new_qty)
+    if line is None:
+        return jsonify({"error": "not found"}), 404
+
+    return jsonify(line), 200
 
 
 # DELETE /api/cart/<cart_id>  – remove item from cart
 @carts_bp.route("/cart/<int:cart_id>", methods=["DELETE"])
 @jwt_required()
 def delete_cart_item(cart_id: int):
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
-    cart_item = CartItem.query.get(cart_id)
-
-    if not cart_item or cart_item.user_id != user.id:
+    if not get_cart_store().remove(current_user.id, cart_id):
         return jsonify({"error": "not found"}), 404
 
-    db.session.delete(cart_item)
-    db.session.commit()
     return jsonify({"message": "deleted"}), 200
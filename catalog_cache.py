@@ -0,0 +1,61 @@
+import os
+
+from lru import LRUCache
+
+# Max number of cached product/list responses kept per process
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+
+
+class CatalogCache(LRUCache):
+    """
+    In-process LRU of ready-to-send product responses.
+
+    Entries are tagged with the catalog version they were built from. Any
+    write to the catalog calls bump_version(), which makes every older entry
+    unreachable, so readers never need to compare timestamps or re-query.
+    """
+
+    def __init__(self, maxsize: int = CATALOG_CACHE_SIZE):
+        super().__init__(maxsize)
+        self.version = 0
+
+    def init_app(self, app) -> None:
+        self.maxsize = app.config.get("CATALOG_CACHE_SIZE", self.maxsize)
+        self.reset()
+
+    def bump_version(self) -> int:
+        """Invalidate everything cached so far; call after a catalog commit."""
+        with self.lock:
+            self.version += 1
+            self.clear()
+            return self.version
+
+    def set(self, key, value, version: int) -> None:
+        """Store value unless the catalog changed while it was being built."""
+        with self.lock:
+            if version == self.version:
+                super().set(key, value)
+
+    def get_or_build(self, key, build):
+        """
+        Return the cached value for key, or call build() and cache its
+        result. build() may return None to skip caching (e.g. not found).
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        # Read the version before touching the DB so a concurrent bump
+        # can't label stale data as current
+        version = self.version
+        entry = build()
+        if entry is not None:
+            self.set(key, entry, version)
+        return entry
+
+    def stats(self) -> dict:
+        return {"version": self.version, **super().stats()}
+
+
+# Shared cache for product list/detail responses
+catalog_cache = CatalogCache()
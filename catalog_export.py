@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import stat
+import tempfile
+import textwrap
+import threading
+from datetime import datetime
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Product
+from catalog_cache import catalog_cache
+
+# Where the product export is written; a .gz sibling is written next to it
+CAMPAIGN_EXPORT_PATH = os.getenv("CAMPAIGN_EXPORT_PATH", "campaign.json")
+
+# Products read from the DB per batch while exporting
+EXPORT_BATCH_SIZE = 500
+
+# The process umask, read once at import: it can only be read by setting
+# it, which would race files created by other threads later on
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: str) -> int:
+    """
+    Permissions for a new copy of path: those of the file it replaces, or
+    the umask default a plain open() would give (e.g. 0644).
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _write_atomic(path: str, chunks) -> None:
+    """
+    Write chunks to path and its .gz sibling through temp files in the same
+    directory, then rename both into place. Readers see either the old file
+    or the complete new one, never a partial write. mkstemp creates the
+    temp files owner-only, so they get path's usual permissions first.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".campaign-", suffix=".tmp")
+    gz_fd, tmp_gz_path = tempfile.mkstemp(
+        dir=directory, prefix=".campaign-", suffix=".gz.tmp"
+    )
+
+    try:
+        os.chmod(tmp_path, _file_mode(path))
+        os.chmod(tmp_gz_path, _file_mode(path + ".gz"))
+        with os.fdopen(fd, "wb") as f, os.fdopen(gz_fd, "wb") as raw_gz:
+            with gzip.GzipFile(fileobj=raw_gz, mode="wb") as gz:
+                for chunk in chunks:
+                    f.write(chunk)
+                    gz.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+            raw_gz.flush()
+            os.fsync(raw_gz.fileno())
+
+        os.replace(tmp_path, path)
+        os.replace(tmp_gz_path, path + ".gz")
+    except BaseException:
+        for leftover in (tmp_path, tmp_gz_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+
+def _export_chunks():
+    """
+    Yield the product list as bytes, formatted like json.dump(indent=4),
+    reading EXPORT_BATCH_SIZE products at a time.
+    """
+    statement = (
+        select(Product)
+        .order_by(Product.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    first = True
+    for batch in db.session.execute(statement).scalars().partitions():
+        parts = []
+        for product in batch:
+            item = textwrap.indent(json.dumps(product.to_dict(), indent=4), "    ")
+            parts.append(("[\n" if first else ",\n") + item)
+            first = False
+        yield "".join(parts).encode()
+
+    yield b"[]" if first else b"\n]"
+
+
+class CatalogExporter:
+    """
+    Writes the product catalog to campaign.json (plus campaign.json.gz).
+    Exports are skipped while the catalog version hasn't changed since the
+    last one written by this process.
+    """
+
+    def __init__(self, path: str = CAMPAIGN_EXPORT_PATH):
+        self.path = path
+        self.exported_version = None
+        self.last_export_at = None
+        self._lock = threading.Lock()
+
+    def export(self, force: bool = False) -> bool:
+        """Export if the catalog changed (or force). Returns True if written."""
+        with self._lock:
+            # Read before querying so a concurrent bump triggers a re-export
+            version = catalog_cache.version
+            if not force and version == self.exported_version:
+                return False
+
+            _write_atomic(self.path, _export_chunks())
+            self.exported_version = version
+            self.last_export_at = datetime.utcnow()
+            return True
+
+
+# Shared exporter used at startup, after syncs and by the CLI
+catalog_exporter = CatalogExporter()
@@ -0,0 +1,281 @@
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import requests
+from sqlalchemy import func, insert, select, update
+
+from extensions import db
+from models import Product
+from catalog_cache import catalog_cache
+
+# DummyJSON catalog endpoint and how often the background syncer polls it
+DUMMYJSON_PRODUCTS_URL = os.getenv(
+    "DUMMYJSON_PRODUCTS_URL", "https://dummyjson.com/products?limit=0"
+)
+PRODUCT_SYNC_INTERVAL = int(os.getenv("PRODUCT_SYNC_INTERVAL", "900"))
+PRODUCT_SYNC_TIMEOUT = int(os.getenv("PRODUCT_SYNC_TIMEOUT", "30"))
+
+# Rows per executemany batch when writing the synced catalog
+SYNC_BATCH_SIZE = 1000
+
+# Product columns owned by the sync, compared to skip unchanged rows.
+# inventory is not one of them: checkouts decrement it locally, so the
+# upstream stock only seeds it when a product is first inserted.
+SYNCED_FIELDS = (
+    "price",
+    "image_url",
+    "description",
+    "category",
+    "available",
+)
+
+
+def _advance_id_sequence() -> None:
+    """
+    Move PostgreSQL's products id sequence past the largest id, which
+    inserting explicit ids doesn't do. SQLite needs nothing (new rowids are
+    max(rowid) + 1), and MySQL advances AUTO_INCREMENT itself.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return
+    db.session.execute(
+        select(
+            func.setval(
+                func.pg_get_serial_sequence(Product.__tablename__, "id"),
+                select(func.max(Product.id)).scalar_subquery(),
+            )
+        )
+    )
+
+
+def _remote_to_row(p: dict) -> dict:
+    """Map a DummyJSON product onto Product column values."""
+    return {
+        "name": p.get("title"),
+        "price": Decimal(str(p.get("price", 0))).quantize(Decimal("0.01")),
+        "image_url": p.get("thumbnail", None),
+        "description": p.get("description", ""),
+        "category": p.get("category"),
+        "available": True,
+    }
+
+
+def _batches(rows: list, size: int = SYNC_BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def upsert_products(remote_products: list) -> dict:
+    """
+    Bulk insert/update remote products matched by name.
+
+    Existing rows are loaded with a single query, unchanged rows are skipped
+    and the rest are written as batched insert/update mappings in one
+    transaction. New rows keep their DummyJSON id when it is still free so
+    that ids used by the frontend line up with local ones.
+    Returns inserted/updated/unchanged counts.
+    """
+    existing = {}
+    taken_ids = set()
+    columns = [Product.id, Product.name, Product.placeholder] + [
+        getattr(Product, field) for field in SYNCED_FIELDS
+    ]
+    for row in db.session.execute(select(*columns).order_by(Product.id)):
+        taken_ids.add(row.id)
+        # Keep the lowest id if names are duplicated, like .first() did
+        existing.setdefault(row.name, row)
+
+    inserts = []
+    updates = []
+    unchanged = 0
+    seen_names = set()
+    now = datetime.utcnow()
+
+    for p in remote_products:
+        row = _remote_to_row(p)
+        name = row["name"]
+        if not name or name in seen_names:
+            continue
+        seen_names.add(name)
+
+        current = existing.get(name)
+        if current is None:
+            remote_id = p.get("id")
+            if isinstance(remote_id, int) and remote_id not in taken_ids:
+                row["id"] = remote_id
+                taken_ids.add(remote_id)
+            row["inventory"] = p.get("stock", 0)
+            inserts.append(row)
+        elif current.placeholder:
+            # Created on add-to-cart from client data: take everything,
+            # including the stock, from upstream
+            row["id"] = current.id
+            row["updated_at"] = now
+            row["inventory"] = p.get("stock", 0)
+            row["placeholder"] = False
+            updates.append(row)
+        elif any(getattr(current, f) != row[f] for f in SYNCED_FIELDS):
+            row["id"] = current.id
+            row["updated_at"] = now
+            updates.append(row)
+        else:
+            unchanged += 1
+
+    # Explicit ids go first, and the id sequence is moved past them before
+    # the rest are inserted, so a generated id never collides with one
+    with_ids = [row for row in inserts if "id" in row]
+    for batch in _batches(with_ids):
+        db.session.execute(insert(Product), batch)
+    if with_ids:
+        _advance_id_sequence()
+    for batch in _batches([row for row in inserts if "id" not in row]):
+        db.session.execute(insert(Product), batch)
+    for batch in _batches(updates):
+        db.session.execute(update(Product), batch)
+
+    db.session.commit()
+    if inserts or updates:
+        catalog_cache.bump_version()
+
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "unchanged": unchanged,
+    }
+
+
+def fetchApiProducts(etag=None, last_modified=None):
+    """
+    Sync products from DummyJSON into the local database.
+    If a product exists (by name), update fields; otherwise, create it.
+
+    `etag` / `last_modified` are the validators from the previous sync. They
+    are sent as a conditional request so an unchanged catalog costs a 304.
+    Returns a dict with the sync status and the new validators.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        res = requests.get(
+            DUMMYJSON_PRODUCTS_URL,
+            headers=headers,
+            timeout=PRODUCT_SYNC_TIMEOUT,
+        )
+        if res.status_code == 304:
+            return {
+                "status": "not_modified",
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+        res.raise_for_status()
+        data = res.json()
+    except Exception as e:
+        print("Error fetching DummyJSON products:", e)
+        return {"status": "error", "error": str(e)}
+
+    counts = upsert_products(data.get("products", []))
+
+    return {
+        "status": "synced",
+        **counts,
+        "etag": res.headers.get("ETag"),
+        "last_modified": res.headers.get("Last-Modified"),
+    }
+
+
+class CatalogSyncer:
+    """
+    Runs fetchApiProducts outside the request path, either on a fixed
+    interval from a daemon thread or on demand. Only one sync runs at a time
+    per process; overlapping triggers return immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.etag = None
+        self.last_modified = None
+        self.last_sync_at = None
+        self.last_result = None
+        self._listeners = []
+
+    def add_listener(self, callback) -> None:
+        """Call callback() (inside the app context) after each successful sync."""
+        self._listeners.append(callback)
+
+    def run_once(self, app=None) -> dict:
+        """Run a single sync unless one is already in progress."""
+        if not self._lock.acquire(blocking=False):
+            return {"status": "in_progress"}
+
+        try:
+            if app is not None:
+                with app.app_context():
+                    result = self._sync()
+            else:
+                result = self._sync()
+        finally:
+            self._lock.release()
+
+        return result
+
+    def _sync(self) -> dict:
+        result = fetchApiProducts(self.etag, self.last_modified)
+
+        if result["status"] in ("synced", "not_modified"):
+            self.etag = result.get("etag")
+            self.last_modified = result.get("last_modified")
+            self.last_sync_at = datetime.utcnow()
+            for callback in self._listeners:
+                callback()
+
+        self.last_result = result
+        return result
+
+    def start(self, app, interval: int = PRODUCT_SYNC_INTERVAL) -> None:
+        """Start the background sync loop (no-op if interval <= 0)."""
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop,
+            args=(app, interval),
+            name="catalog-sync",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self, app, interval: int) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once(app)
+            except Exception as e:
+                print("Catalog sync failed:", e)
+            self._stop.wait(interval)
+
+    def status(self) -> dict:
+        return {
+            "running": self._lock.locked(),
+            "last_sync_at": (
+                self.last_sync_at.isoformat() if self.last_sync_at else None
+            ),
+            "last_result": self.last_result,
+        }
+
+
+# Shared syncer used by the app, the CLI and the manual sync endpoint
+syncer = CatalogSyncer()
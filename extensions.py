@@ -1,8 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
+from jwt_cache import CachingJWTManager
 
 # Shared database object used across the app 
 db = SQLAlchemy()
 
 # Shared JWT manager used to create and validate access tokens
-jwt = JWTManager()
+jwt = CachingJWTManager()
@@ -0,0 +1,113 @@
+import os
+import time
+from collections import namedtuple
+
+from flask import g
+from sqlalchemy import select
+
+from extensions import db, jwt
+from models import User
+from blocklist import token_blocklist
+from lru import LRUCache
+
+# How long a resolved user stays cached, and how many are kept per process
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "60"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+
+# What handlers get from flask_jwt_extended.current_user
+CurrentUser = namedtuple("CurrentUser", "id email token_version")
+
+
+class IdentityCache(LRUCache):
+    """
+    Small TTL cache of user id -> CurrentUser.
+
+    Tokens carry the user id ("uid") and token version ("tv"), so a cache hit
+    resolves the caller without touching the users table. Changes made by
+    this process (e.g. a password reset) invalidate the entry right away;
+    other workers pick them up within IDENTITY_CACHE_TTL seconds.
+    """
+
+    def __init__(
+        self, ttl: int = IDENTITY_CACHE_TTL, maxsize: int = IDENTITY_CACHE_SIZE
+    ):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def init_app(self, app) -> None:
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", self.ttl)
+        self.maxsize = app.config.get("IDENTITY_CACHE_SIZE", self.maxsize)
+        self.reset()
+
+    def get(self, user_id: int):
+        entry = super().get(user_id, valid=lambda e: e[1] >= time.monotonic())
+        return entry[0] if entry is not None else None
+
+    def set(self, user: CurrentUser) -> None:
+        if self.ttl > 0:
+            super().set(user.id, (user, time.monotonic() + self.ttl))
+
+    def invalidate(self, user_id: int) -> None:
+        self.pop(user_id)
+
+    def stats(self) -> dict:
+        return {"ttl": self.ttl, **super().stats()}
+
+
+# Shared cache behind current_user
+identity_cache = IdentityCache()
+
+
+def token_claims(user: User) -> dict:
+    """Extra claims put in every token issued for user."""
+    return {"uid": user.id, "tv": user.token_version}
+
+
+def _query_user(jwt_payload: dict):
+    columns = select(User.id, User.email, User.token_version)
+    if "uid" in jwt_payload:
+        statement = columns.where(User.id == jwt_payload["uid"])
+    else:
+        # Tokens issued before the uid claim existed only carry the email
+        statement = columns.where(User.email == jwt_payload["sub"])
+
+    row = db.session.execute(statement).first()
+    return CurrentUser(*row) if row else None
+
+
+def resolve_user(jwt_payload: dict):
+    """Return the CurrentUser a token belongs to, or None if it no longer exists."""
+    user = None
+    if "uid" in jwt_payload:
+        user = identity_cache.get(jwt_payload["uid"])
+    if user is None:
+        user = _query_user(jwt_payload)
+        if user is not None:
+            identity_cache.set(user)
+    return user
+
+
+@jwt.token_in_blocklist_loader
+def token_is_revoked(jwt_header, jwt_payload) -> bool:
+    """
+    Reject revoked tokens (e.g. refresh tokens that were already used),
+    tokens of deleted users and tokens from before a password reset.
+    """
+    if token_blocklist.is_revoked(jwt_payload["jti"]):
+        return True
+
+    # Runs first on every protected request; remember the result so the
+    # user lookup below doesn't resolve the same token again
+    user = resolve_user(jwt_payload)
+    g._current_identity = (jwt_payload.get("jti"), user)
+    if user is None:
+        return True
+    return jwt_payload.get("tv", user.token_version) != user.token_version
+
+
+@jwt.user_lookup_loader
+def load_current_user(jwt_header, jwt_payload):
+    memo = g.pop("_current_identity", None)
+    if memo is not None and memo[0] == jwt_payload.get("jti"):
+        return memo[1]
+    return resolve_user(jwt_payload)
@@ -0,0 +1,356 @@
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from extensions import db
+from models import InventorySlot, Order, OrderItem, Product
+from catalog_cache import catalog_cache
+
+# How long a pending order holds its stock before the sweeper releases it
+RESERVATION_MINUTES = int(os.getenv("RESERVATION_MINUTES", "15"))
+
+# Seconds between sweeps for expired reservations
+RESERVATION_SWEEP_INTERVAL = int(os.getenv("RESERVATION_SWEEP_INTERVAL", "60"))
+
+# Slots a product's stock is split into by shard_product()
+INVENTORY_SLOTS = int(os.getenv("INVENTORY_SLOTS", "8"))
+
+products = Product.__table__
+slots = InventorySlot.__table__
+
+
+class OutOfStock(Exception):
+    """Raised when a reservation can't take every line it asked for."""
+
+
+def reservation_deadline() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=RESERVATION_MINUTES)
+
+
+def _adjust_stock(statement, lines: dict) -> int:
+    """Run statement once per (product_id, quantity); returns rows changed."""
+    params = [
+        {"product_id": pid, "quantity": qty} for pid, qty in sorted(lines.items())
+    ]
+    if db.engine.dialect.supports_sane_multi_rowcount:
+        return db.session.execute(statement, params).rowcount
+    return sum(db.session.execute(statement, p).rowcount for p in params)
+
+
+def _sharded(product_ids) -> dict:
+    """{product_id: slot count} for the sharded products in product_ids."""
+    rows = db.session.execute(
+        select(InventorySlot.product_id, func.count())
+        .join(Product, Product.id == InventorySlot.product_id)
+        .where(InventorySlot.product_id.in_(product_ids), Product.sharded.is_(True))
+        .group_by(InventorySlot.product_id)
+    )
+    return dict(rows.all())
+
+
+def _take_slot(product_id: int, slot: int, quantity: int) -> bool:
+    return db.session.execute(
+        update(slots)
+        .where(
+            slots.c.product_id == product_id,
+            slots.c.slot == slot,
+            slots.c.quantity >= quantity,
+        )
+        .values(quantity=slots.c.quantity - quantity)
+    ).rowcount == 1
+
+
+def _take_from_slots(product_id: int, quantity: int, slot_count: int) -> bool:
+    """
+    Take quantity from a sharded product. Checkouts start on a random slot
+    so concurrent ones rarely update the same row. If that slot is short,
+    try the others, and as a last resort take the quantity from several.
+    """
+    if _take_slot(product_id, random.randrange(slot_count), quantity):
+        return True
+
+    rows = db.session.execute(
+        select(slots.c.slot, slots.c.quantity).where(
+            slots.c.product_id == product_id, slots.c.quantity > 0
+        )
+    ).all()
+    random.shuffle(rows)
+    for slot, available in rows:
+        if available >= quantity and _take_slot(product_id, slot, quantity):
+            return True
+
+    remaining = quantity
+    for slot, available in rows:
+        take = min(remaining, available)
+        if take and _take_slot(product_id, slot, take):
+            remaining -= take
+            if not remaining:
+                return True
+    return False
+
+
+def reserve_stock(lines: dict) -> bool:
+    """
+    Take {product_id: quantity} out of inventory, all or nothing, with one
+    executemany of
+
+        UPDATE products SET inventory = inventory - :quantity
+        WHERE id = :product_id AND inventory >= :quantity
+
+    Each row is checked and decremented atomically by the database, so
+    concurrent checkouts can't oversell. Sharded products are taken from
+    their inventory_slots rows the same way instead.
+
+    Raises OutOfStock if any line can't be filled; the caller must roll
+    back the partial decrements. Nothing is committed. Returns True if a
+    products row changed, i.e. the catalog cache needs a bump.
+    """
+    sharded = _sharded(lines)
+    plain = {pid: qty for pid, qty in lines.items() if pid not in sharded}
+
+    if plain:
+        statement = (
+            update(products)
+            .where(
+                products.c.id == bindparam("product_id"),
+                products.c.inventory >= bindparam("quantity"),
+            )
+            .values(inventory=products.c.inventory - bindparam("quantity"))
+        )
+        if _adjust_stock(statement, plain) != len(plain):
+            raise OutOfStock()
+
+    for product_id in sorted(sharded):
+        if not _take_from_slots(product_id, lines[product_id], sharded[product_id]):
+            raise OutOfStock()
+
+    return bool(plain)
+
+
+def short_products(lines: dict) -> list:
+    """The product ids in {product_id: quantity} without enough stock."""
+    rows = db.session.execute(
+        select(Product.id, Product.inventory).where(Product.id.in_(lines))
+    )
+    stock = dict(rows.all())
+    rows = db.session.execute(
+        select(InventorySlot.product_id, func.sum(InventorySlot.quantity))
+        .join(Product, Product.id == InventorySlot.product_id)
+        .where(InventorySlot.product_id.in_(lines), Product.sharded.is_(True))
+        .group_by(InventorySlot.product_id)
+    )
+    stock.update(rows.all())
+    return sorted(pid for pid, qty in lines.items() if stock.get(pid, 0) < qty)
+
+
+def release_order(order_id: int) -> bool:
+    """
+    Put an order's reserved stock back. The reservation is claimed first
+    (reserved_until is cleared only if still set), so a cancel racing the
+    sweeper releases it once. Returns False if there was nothing to
+    release. Nothing is committed.
+    """
+    claimed = db.session.execute(
+        update(Order.__table__)
+        .where(Order.id == order_id, Order.reserved_until.is_not(None))
+        .values(reserved_until=None)
+    ).rowcount
+    if not claimed:
+        return False
+
+    rows = db.session.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id == order_id)
+        .group_by(OrderItem.product_id)
+    )
+    lines = dict(rows.all())
+    sharded = _sharded(lines) if lines else {}
+    plain = {pid: qty for pid, qty in lines.items() if pid not in sharded}
+
+    if plain:
+        statement = (
+            update(products)
+            .where(products.c.id == bindparam("product_id"))
+            .values(inventory=products.c.inventory + bindparam("quantity"))
+        )
+        _adjust_stock(statement, plain)
+
+    for product_id, slot_count in sharded.items():
+        db.session.execute(
+            update(slots)
+            .where(
+                slots.c.product_id == product_id,
+                slots.c.slot == random.randrange(slot_count),
+            )
+            .values(quantity=slots.c.quantity + lines[product_id])
+        )
+    return True
+
+
+def mark_paid(order_id: int) -> bool:
+    """
+    Mark an order and its items paid, selling its reserved stock. The
+    reservation is claimed the same way release_order does, so paying
+    can't race the sweeper or a cancel: only a pending order that still
+    holds its stock becomes paid. Returns False if the order wasn't
+    awaiting payment. Nothing is committed.
+    """
+    claimed = db.session.execute(
+        update(Order.__table__)
+        .where(
+            Order.id == order_id,
+            Order.payment_status == "pending",
+            Order.reserved_until.is_not(None),
+        )
+        .values(payment_status="paid", reserved_until=None)
+    ).rowcount
+    if not claimed:
+        return False
+
+    db.session.execute(
+        update(OrderItem.__table__)
+        .where(OrderItem.order_id == order_id)
+        .values(payment_status="paid")
+    )
+    return True
+
+
+def release_expired(now: datetime = None) -> int:
+    """
+    Release every pending order whose reservation has run out and mark it
+    "expired". Returns the number of orders released.
+    """
+    now = now or datetime.utcnow()
+    order_ids = db.session.scalars(
+        select(Order.id).where(
+            Order.payment_status == "pending", Order.reserved_until < now
+        )
+    ).all()
+
+    released = 0
+    for order_id in order_ids:
+        if release_order(order_id):
+            db.session.execute(
+                update(Order.__table__)
+                .where(Order.id == order_id)
+                .values(payment_status="expired")
+            )
+            released += 1
+    db.session.commit()
+
+    if released:
+        catalog_cache.bump_version()
+    return released
+
+
+def stock_level(product: Product) -> int:
+    """Units in stock right now; for sharded products, the sum of the slots."""
+    if not product.sharded:
+        return product.inventory
+    return db.session.scalar(
+        select(func.coalesce(func.sum(InventorySlot.quantity), 0)).where(
+            InventorySlot.product_id == product.id
+        )
+    )
+
+
+def spread_stock(product: Product, total: int, slot_count: int) -> None:
+    """
+    Replace product's slots with slot_count slots sharing total units as
+    evenly as possible. Nothing is committed.
+    """
+    base, extra = divmod(total, slot_count)
+    db.session.execute(delete(slots).where(slots.c.product_id == product.id))
+    db.session.execute(
+        insert(slots),
+        [
+            {"product_id": product.id, "slot": i, "quantity": base + (i < extra)}
+            for i in range(slot_count)
+        ],
+    )
+    product.inventory = total
+    db.session.expire(product, ["inventory_slots"])
+
+
+def shard_product(product: Product, slot_count: int = INVENTORY_SLOTS) -> None:
+    """Split product's stock into slot_count slots. Nothing is committed."""
+    spread_stock(product, stock_level(product), slot_count)
+    product.sharded = True
+
+
+def unshard_product(product: Product) -> None:
+    """Fold product's slots back into products.inventory. Nothing is committed."""
+    product.inventory = stock_level(product)
+    product.sharded = False
+    db.session.execute(delete(slots).where(slots.c.product_id == product.id))
+    db.session.expire(product, ["inventory_slots"])
+
+
+def refresh_sharded_inventory() -> int:
+    """
+    Copy each sharded product's slot total into products.inventory, which
+    listings and filters read. Returns the number of products whose total
+    changed.
+    """
+    total = (
+        select(func.coalesce(func.sum(slots.c.quantity), 0))
+        .where(slots.c.product_id == products.c.id)
+        .scalar_subquery()
+    )
+    changed = db.session.execute(
+        update(products)
+        .where(products.c.sharded.is_(True), products.c.inventory != total)
+        .values(inventory=total)
+    ).rowcount
+    db.session.commit()
+
+    if changed:
+        catalog_cache.bump_version()
+    return changed
+
+
+class ReservationSweeper:
+    """
+    Calls release_expired() and refresh_sharded_inventory() on a fixed
+    interval from a daemon thread.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, app, interval: int = RESERVATION_SWEEP_INTERVAL) -> None:
+        """Start the sweep loop (no-op if interval <= 0)."""
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop,
+            args=(app, interval),
+            name="reservation-sweep",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self, app, interval: int) -> None:
+        while not self._stop.wait(interval):
+            try:
+                with app.app_context():
+                    release_expired()
+                    refresh_sharded_inventory()
+            except Exception as e:
+                print("Reservation sweep failed:", e)
+
+
+# Shared sweeper started by app.py
+reservation_sweeper = ReservationSweeper()
@@ -0,0 +1,96 @@
+import hashlib
+import inspect
+import os
+import time
+
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config
+from flask_jwt_extended.default_callbacks import default_decode_key_callback
+
+from lru import LRUCache
+
+# Verified tokens remembered per process; 0 turns the cache off
+JWT_DECODE_CACHE_SIZE = int(os.getenv("JWT_DECODE_CACHE_SIZE", "0"))
+
+# Parameters of the private JWTManager hook the cache overrides, as of
+# flask_jwt_extended 4.x (pinned in requirements.txt)
+DECODE_HOOK_PARAMETERS = ("self", "encoded_token", "csrf_value", "allow_expired")
+
+
+def decode_hook_compatible() -> bool:
+    """Whether the installed JWTManager still has the hook the cache expects."""
+    hook = getattr(JWTManager, "_decode_jwt_from_config", None)
+    if hook is None:
+        return False
+    return tuple(inspect.signature(hook).parameters) == DECODE_HOOK_PARAMETERS
+
+
+DECODE_HOOK_COMPATIBLE = decode_hook_compatible()
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers verified token claims.
+
+    Clients send the same bearer token on every request until it expires,
+    so after the first signature check the claims are served from an LRU
+    keyed by the token's SHA-256 digest (and the verification key, so a key
+    change never reuses old results). Entries are only used before the
+    token's exp. Revocation is unaffected: flask_jwt_extended runs the
+    blocklist check on the returned claims every time.
+
+    Opt in with JWT_DECODE_CACHE_SIZE > 0. The cache stays off, and every
+    call goes straight to JWTManager, if a decode_key_loader is registered
+    (it may pick a different key per token, which the cache key can't see)
+    or if the installed flask_jwt_extended changed the overridden hook.
+    """
+
+    def __init__(self, app=None, add_context_processor: bool = False):
+        self._decode_cache = LRUCache(JWT_DECODE_CACHE_SIZE)
+        super().__init__(app, add_context_processor)
+
+    @property
+    def decode_cache_size(self) -> int:
+        return self._decode_cache.maxsize
+
+    @decode_cache_size.setter
+    def decode_cache_size(self, size: int) -> None:
+        self._decode_cache.maxsize = size
+
+    def init_app(self, app, add_context_processor: bool = False) -> None:
+        super().init_app(app, add_context_processor)
+        self.decode_cache_size = app.config.get(
+            "JWT_DECODE_CACHE_SIZE", self.decode_cache_size
+        )
+        self.clear_decode_cache()
+        if self.decode_cache_size > 0 and not DECODE_HOOK_COMPATIBLE:
+            print(
+                "JWT decode cache disabled: unsupported flask_jwt_extended "
+                "JWTManager._decode_jwt_from_config signature"
+            )
+
+    def decode_cache_enabled(self) -> bool:
+        return (
+            self.decode_cache_size > 0
+            and DECODE_HOOK_COMPATIBLE
+            and self._decode_key_callback is default_decode_key_callback
+        )
+
+    def _decode_jwt_from_config(self, encoded_token: str, *args, **kwargs) -> dict:
+        # Only plain lookups (no csrf_value, not allow_expired) are cached
+        if not self.decode_cache_enabled() or any(args) or any(kwargs.values()):
+            return super()._decode_jwt_from_config(encoded_token, *args, **kwargs)
+
+        key = (hashlib.sha256(encoded_token.encode()).digest(), config.decode_key)
+        claims = self._decode_cache.get(key, valid=lambda c: time.time() < c["exp"])
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token)
+            if "exp" in claims:
+                self._decode_cache.set(key, claims)
+        return dict(claims)
+
+    def clear_decode_cache(self) -> None:
+        self._decode_cache.reset()
+
+    def decode_cache_stats(self) -> dict:
+        return {"enabled": self.decode_cache_enabled(), **self._decode_cache.stats()}
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe mapping of at most maxsize entries that evicts the least
+    recently used one, with hit/miss/eviction counters. maxsize <= 0 keeps
+    nothing.
+
+    The in-process caches build on it. Subclasses that need a check and an
+    update to happen together can hold self.lock (re-entrant) around them.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None, valid=None):
+        """
+        The value for key, marked most recently used and counted as a hit.
+        A missing key, or a value for which valid(value) is false, counts
+        as a miss and returns default.
+        """
+        with self.lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING or (valid is not None and not valid(value)):
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value) -> None:
+        with self.lock:
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key) -> None:
+        with self.lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry; the counters keep running."""
+        with self.lock:
+            self._entries.clear()
+
+    def reset(self) -> None:
+        """Drop every entry and zero the counters."""
+        with self.lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+
+from catalog_cache import catalog_cache
+from cart_store import get_cart_store
+from extensions import jwt
+from identity import identity_cache
+from passwords import password_hasher
+from ratelimit import auth_limiter
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+# GET /api/metrics  (in-process cache counters)
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return jsonify(
+        {
+            "catalog_cache": catalog_cache.stats(),
+            "identity_cache": identity_cache.stats(),
+            "password_hasher": password_hasher.stats(),
+            "jwt_decode_cache": jwt.decode_cache_stats(),
+            "auth_rate_limit": auth_limiter.stats(),
+            "cart_store": get_cart_store().stats(),
+        }
+    ), 200
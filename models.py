@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password
 
 
 class User(db.Model):
@@ -17,11 +17,15 @@ class User(db.Model):
     security_answer_hash = db.Column(db.String(255), nullable=True)
 
     # Hashed password storage
-    password_hash = db.Column(db.String(50), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
 
     # Timestamp for when the user account was created
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Copied into every JWT; bumping it (e.g. on password reset) revokes
+    # all tokens issued before
+    token_version = db.Column(db.Integer, nullable=False, default=0)
+
     # Relationships
     cart_items = db.relationship(
         "CartItem",
@@ -36,23 +40,23 @@ class User(db.Model):
 
     # Store a safely hashed password
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     # Verify a password against the stored hash
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def set_security_answer(self, answer: str) -> None:
         """Hash and store the normalized security answer (case-insensitive)."""
         normalized = answer.strip().lower()
-        self.security_answer_hash = generate_password_hash(normalized)
+        self.security_answer_hash = hash_password(normalized)
 
     def check_security_answer(self, answer: str) -> bool:
         """Verify a security answer against the stored hash."""
         if not self.security_answer_hash:
             return False
         normalized = answer.strip().lower()
-        return check_password_hash(self.security_answer_hash, normalized)
+        return verify_password(self.security_answer_hash, normalized)
 
     # Convert user info into a dictionary
     def to_dict(self) -> dict:
@@ -69,8 +73,8 @@ class Product(db.Model):
     # Primary key for each product
     id = db.Column(db.Integer, primary_key=True)
 
-    # Product name shown in the frontend
-    name = db.Column(db.String(100), nullable=False)
+    # Product name shown in the frontend, also the key the catalog sync matches on
+    name = db.Column(db.String(100), nullable=False, index=True)
 
     # Price stored as a numeric type, cannot be negative
     price = db.Column(
@@ -78,6 +82,7 @@ class Product(db.Model):
         db.CheckConstraint("price >= 0", name="check_product_price_positive"),
         nullable=False,
         default=1,
+        index=True,
     )
 
     # Optional URL for the product image used on the frontend
@@ -89,35 +94,113 @@ class Product(db.Model):
         db.CheckConstraint("inventory >= 0", name="check_product_inventory_positive"),
         default=0,
         nullable=False,
+        index=True,
     )
 
     # Controls whether product is actually available or not
     available = db.Column(db.Boolean, default=True, nullable=False)
 
+    # Stock is split across inventory_slots rows; inventory is then a
+    # periodically refreshed total of the slots
+    sharded = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Created from client data on add-to-cart; has no stock until the next
+    # catalog sync overwrites it with the upstream product
+    placeholder = db.Column(db.Boolean, default=False, nullable=False)
+
     # Text description of product
     description = db.Column(db.String(1000), nullable=True)
 
+    # Catalog category slug (e.g. "smartphones") used for related products
+    category = db.Column(db.String(100), nullable=True, index=True)
+
     # Time when product was created
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Time of the last change, used for Last-Modified on product responses
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=True,
+    )
+
     # All cart items which reference this product
     cart_items = db.relationship("CartItem", back_populates="product")
 
     # All order items that reference this product
     order_items = db.relationship("OrderItem", back_populates="product")
 
-    # Helper method to convert into dict
-    def to_dict(self) -> dict:
-        return {
-            "id": self.id,
-            "name": self.name,
-            "price": float(self.price),
-            "image_url": self.image_url,
-            "inventory": self.inventory,
-            "available": self.available,
-            "description": self.description,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+    # Stock slots of a sharded product
+    inventory_slots = db.relationship(
+        "InventorySlot",
+        back_populates="product",
+        cascade="all, delete-orphan",
+    )
+
+    # Lets keyset pages filtered on availability walk the index in id order
+    __table_args__ = (
+        db.Index("ix_products_available_id", "available", "id"),
+    )
+
+    # Fields returned by to_dict(), also the allowed values for ?fields=
+    SERIALIZED_FIELDS = (
+        "id",
+        "name",
+        "price",
+        "image_url",
+        "inventory",
+        "available",
+        "description",
+        "category",
+        "created_at",
+        "updated_at",
+    )
+
+    # Helper method to convert into dict. With `fields`, only those
+    # attributes are read, so it works on rows loaded with load_only().
+    def to_dict(self, fields=None) -> dict:
+        data = {}
+        for field in fields or self.SERIALIZED_FIELDS:
+            value = getattr(self, field)
+            if field == "price":
+                value = float(value)
+            elif field in ("created_at", "updated_at"):
+                value = value.isoformat() if value else None
+            data[field] = value
+        return data
+
+    # Last change time, falling back to creation for rows without updated_at
+    @property
+    def last_modified(self):
+        return self.updated_at or self.created_at
+
+
+class InventorySlot(db.Model):
+    __tablename__ = "inventory_slots"
+
+    # Product whose stock this slot holds part of
+    product_id = db.Column(
+        db.Integer,
+        db.ForeignKey("products.id"),
+        primary_key=True,
+    )
+
+    # Slot number, 0 to the product's slot count - 1
+    slot = db.Column(db.Integer, primary_key=True)
+
+    # Units in this slot, can't be negative
+    quantity = db.Column(
+        db.Integer,
+        db.CheckConstraint(
+            "quantity >= 0", name="check_inventoryslot_quantity_positive"
+        ),
+        nullable=False,
+        default=0,
+    )
+
+    # Back-reference to the Product this slot belongs to
+    product = db.relationship("Product", back_populates="inventory_slots")
 
 
 class CartItem(db.Model):
@@ -204,6 +287,9 @@ class Order(db.Model):
     # Payment status
     payment_status = db.Column(db.String(20), default="pending", nullable=False)
 
+    # Stock for this order is held until then; None once paid or released
+    reserved_until = db.Column(db.DateTime, nullable=True, index=True)
+
     # Time created
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -230,6 +316,9 @@ class Order(db.Model):
             "user_id": self.user_id,
             "total_price": self.total_price,
             "payment_status": self.payment_status,
+            "reserved_until": (
+                self.reserved_until.isoformat() if self.reserved_until else None
+            ),
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
@@ -303,3 +392,16 @@ class OrderItem(db.Model):
             "payment_status": self.payment_status,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+
+    # JWT id of the revoked token
+    jti = db.Column(db.String(36), primary_key=True)
+
+    # When the token would have expired anyway; rows past this are dropped
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # Time revoked
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
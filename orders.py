@@ -1,26 +1,95 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy import delete, func, insert, select, update
 
 from extensions import db
-from models import User, CartItem, Order, OrderItem
+from models import CartItem, Order, OrderItem, Product
+from cart_store import get_cart_store
+from catalog_cache import catalog_cache
+from inventory import (
+    OutOfStock,
+    mark_paid,
+    release_order,
+    reservation_deadline,
+    reserve_stock,
+    short_products,
+)
 
 orders_bp = Blueprint("orders", __name__, url_prefix="/api")
 
 
+def _cart_lines(user_id: int) -> list:
+    """
+    The user's cart lines as (product_id, quantity, price, available) from
+    one query; price and available are None if the product no longer
+    exists. The cart rows stay locked (SELECT ... FOR UPDATE) until the
+    transaction ends, so checkout orders exactly what it reserved.
+    """
+    statement = (
+        select(CartItem.product_id, CartItem.quantity, Product.price, Product.available)
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.product_id)
+        .with_for_update(of=CartItem)
+    )
+    return db.session.execute(statement).all()
+
+
+def _copy_cart_to_order(user_id: int, order_id: int, cart_lines: list) -> None:
+    """
+    Turn the cart lines read by _cart_lines into order_id's items and clear
+    them from the cart:
+
+        INSERT INTO order_items (...) VALUES (...), executemany
+        UPDATE orders SET total_price = (SELECT SUM(quantity * price) ...)
+        DELETE FROM cart_items WHERE user_id = :user_id AND product_id IN (...)
+
+    The items come from the same rows the stock was reserved for, not from
+    a second read of cart_items, and only those rows are deleted.
+    Nothing is committed; the caller commits them together with the
+    stock reservation.
+    """
+    now = datetime.utcnow()
+    db.session.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price": price,
+                "payment_status": "pending",
+                "created_at": now,
+            }
+            for product_id, quantity, price, _ in cart_lines
+        ],
+    )
+
+    total = (
+        select(func.coalesce(func.sum(OrderItem.quantity * OrderItem.price), 0))
+        .where(OrderItem.order_id == order_id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Order).where(Order.id == order_id).values(total_price=total)
+    )
+
+    product_ids = [product_id for product_id, *_ in cart_lines]
+    db.session.execute(
+        delete(CartItem).where(
+            CartItem.user_id == user_id, CartItem.product_id.in_(product_ids)
+        )
+    )
+
+
 # GET /api/orders  (list my orders)
 @orders_bp.route("/orders", methods=["GET"])
 @jwt_required()
 def list_orders():
-    # Get current user email from JWT
-    current_username = get_jwt_identity()
-
-    # Check database for user
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     # Query orders for this user
-    orders = Order.query.filter_by(user_id=user.id).all()
+    orders = Order.query.filter_by(user_id=current_user.id).all()
     return jsonify([order.to_dict() for order in orders]), 200
 
 
@@ -28,46 +97,43 @@ def list_orders():
 @orders_bp.route("/orders/from-cart", methods=["POST"])
 @jwt_required()
 def create_order_from_cart():
-    # Obtain user email using JWT
-    current_username = get_jwt_identity()
-
-    # Check user exists
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
+    # Write back any cart changes still held by the cart store
+    get_cart_store().flush(current_user.id)
 
-    # Fetch all cart items for this user
-    cart_items = CartItem.query.filter_by(user_id=user.id).all()
-    if not cart_items:
+    cart_lines = _cart_lines(current_user.id)
+    if not cart_lines:
         return jsonify({"error": "cart is empty"}), 400
 
-    # Create new order
-    order = Order(user_id=user.id, payment_status="pending", total_price=0)
+    # If a product was removed or disabled after it was added to the cart
+    for product_id, _, _, available in cart_lines:
+        if not available:
+            return jsonify({"error": f"product {product_id} not available"}), 400
+
+    # Create new order, holding its stock until the reservation runs out
+    order = Order(
+        user_id=current_user.id,
+        payment_status="pending",
+        total_price=0,
+        reserved_until=reservation_deadline(),
+    )
     db.session.add(order)
     db.session.flush()
 
-    # Create order items from cart items
-    for ci in cart_items:
-        # If a product was removed or disabled after it was added to the cart
-        if not ci.product or not ci.product.available:
-            return jsonify({"error": f"product {ci.product_id} not available"}), 400
-
-        oi = OrderItem(
-            order_id=order.id,
-            product_id=ci.product_id,
-            quantity=ci.quantity,
-            price=ci.product.price,
-            payment_status="pending",
-        )
-        db.session.add(oi)
-
-    # Recalculate the total price of the order based on its items and save
-    order.calculate_Total()
-    db.session.commit()
-
-    # Clear the user's cart after creating the order
-    CartItem.query.filter_by(user_id=user.id).delete()
+    # Reserve stock, copy the cart into order items, price the order and
+    # clear the cart, all in the same transaction
+    lines = {product_id: quantity for product_id, quantity, *_ in cart_lines}
+    try:
+        catalog_changed = reserve_stock(lines)
+    except OutOfStock:
+        db.session.rollback()
+        return jsonify(
+            {"error": "insufficient stock", "product_ids": short_products(lines)}
+        ), 409
+
+    _copy_cart_to_order(current_user.id, order.id, cart_lines)
     db.session.commit()
+    if catalog_changed:
+        catalog_cache.bump_version()
 
     return jsonify(order.to_dict()), 201
 
@@ -76,17 +142,9 @@ def create_order_from_cart():
 @orders_bp.route("/orders/<int:order_id>", methods=["GET"])
 @jwt_required()
 def get_order(order_id: int):
-    # Obtain user email from token
-    current_username = get_jwt_identity()
-
-    # Check user exists
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     # Fetch order and ensure it belongs to this user
     order = Order.query.get(order_id)
-    if not order or order.user_id != user.id:
+    if not order or order.user_id != current_user.id:
         return jsonify({"error": "not found"}), 404
 
     return jsonify(order.to_dict()), 200
@@ -96,23 +154,14 @@ def get_order(order_id: int):
 @orders_bp.route("/orders/<int:order_id>/pay", methods=["PUT"])
 @jwt_required()
 def mark_order_paid(order_id: int):
-    # Obtain user email using JWT
-    current_username = get_jwt_identity()
-
-    # Check user exists
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     # Fetch order and ensure it belongs to this user
     order = Order.query.get(order_id)
-    if not order or order.user_id != user.id:
+    if not order or order.user_id != current_user.id:
         return jsonify({"error": "not found"}), 404
 
-    # Set order status as paid
-    order.payment_status = "paid"
-    for oi in order.order_items:
-        oi.payment_status = "paid"
+    if not mark_paid(order.id):
+        db.session.rollback()
+        return jsonify({"error": "order is not awaiting payment"}), 409
 
     db.session.commit()
     return jsonify(order.to_dict()), 200
@@ -122,23 +171,33 @@ def mark_order_paid(order_id: int):
 @orders_bp.route("/orders/<int:order_id>", methods=["DELETE"])
 @jwt_required()
 def cancel_order(order_id: int):
-    # Obtain user email using JWT
-    current_username = get_jwt_identity()
-
-    # Check user exists
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     # Fetch order and ensure it belongs to this user
     order = Order.query.get(order_id)
-    if not order or order.user_id != user.id:
+    if not order or order.user_id != current_user.id:
         return jsonify({"error": "not found"}), 404
 
     # Can only cancel an order if it is still pending
     if order.payment_status != "pending":
         return jsonify({"error": "only pending orders can be canceled"}), 400
 
-    db.session.delete(order)
+    # The order read above may be stale: /pay or the sweeper can commit
+    # at any time. Claim the reservation and delete the order only while
+    # it is still pending, or give up without touching it.
+    if not release_order(order.id):
+        db.session.rollback()
+        return jsonify({"error": "order is not awaiting payment"}), 409
+
+    pending = select(Order.id).where(
+        Order.id == order.id, Order.payment_status == "pending"
+    )
+    db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(pending)))
+    deleted = db.session.execute(
+        delete(Order).where(Order.id == order.id, Order.payment_status == "pending")
+    ).rowcount
+    if not deleted:
+        db.session.rollback()
+        return jsonify({"error": "order is not awaiting payment"}), 409
+
     db.session.commit()
+    catalog_cache.bump_version()
     return jsonify({"message": "deleted"}), 200
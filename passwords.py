@@ -0,0 +1,119 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Werkzeug hash method for new passwords, e.g. "scrypt" or
+# "pbkdf2:sha256:600000" (the last part is the iteration count)
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
+# Hashes computed at once, and how many more requests may wait for a
+# worker before new ones are turned away
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+# Seconds clients are told to wait when the hasher is saturated
+PASSWORD_HASH_RETRY_AFTER = 1
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are already running or queued."""
+
+    retry_after = PASSWORD_HASH_RETRY_AFTER
+
+
+class PasswordHasher:
+    """
+    Runs password hashing on a bounded worker pool.
+
+    hashlib releases the GIL while it computes PBKDF2/scrypt, so the workers
+    use every core while request threads just wait on the result. At most
+    workers + queue_size hashes are admitted at once; anything beyond that
+    fails fast with PasswordHasherBusy instead of piling up behind a burst
+    of logins and starving the rest of the app.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rejected = 0
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """(Re)size the pool from the app config."""
+        with self._lock:
+            self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+            self.queue_size = app.config.get("PASSWORD_HASH_QUEUE", self.queue_size)
+            self.rejected = 0
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(self.workers, 1),
+                    thread_name_prefix="password-hash",
+                )
+                self._slots = threading.BoundedSemaphore(
+                    max(self.workers, 1) + max(self.queue_size, 0)
+                )
+            return self._executor, self._slots
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for its result."""
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+
+
+# Shared hasher used by the User model
+password_hasher = PasswordHasher()
+
+
+def _hash_method() -> str:
+    return current_app.config.get("PASSWORD_HASH_METHOD", PASSWORD_HASH_METHOD)
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method: str) -> str:
+    """The "method:params" prefix werkzeug writes for hashes made with method."""
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def hash_password(password: str) -> str:
+    return password_hasher.run(generate_password_hash, password, _hash_method())
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return password_hasher.run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash: str) -> bool:
+    """True if pwhash was made with a different method or cost than configured."""
+    return pwhash.split("$", 1)[0] != _hash_prefix(_hash_method())
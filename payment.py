@@ -1,7 +1,17 @@
-from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, current_user
 from extensions import db
-from models import User, CartItem, Product, Order, OrderItem
+from models import CartItem, Product, Order, OrderItem
+from cart_store import get_cart_store
+from catalog_cache import catalog_cache
+from inventory import (
+    OutOfStock,
+    mark_paid,
+    release_order,
+    reservation_deadline,
+    reserve_stock,
+    short_products,
+)
 import stripe
 import os
 
@@ -9,20 +19,54 @@ payment_bp = Blueprint("payments", __name__)
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
+# Signing secret of the Stripe webhook endpoint; the webhook is off without it
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+
+
+def confirm_paid_session(session) -> bool:
+    """
+    Mark the order a Stripe Checkout Session was created for as paid, if
+    Stripe says the session is paid. Uses the same claim as
+    PUT /api/orders/<id>/pay, so an order whose reservation already ran out
+    stays as it is. Returns True if the order became paid.
+    """
+    if session.get("payment_status") != "paid":
+        return False
+    try:
+        order_id = int((session.get("metadata") or {}).get("order_id"))
+    except (TypeError, ValueError):
+        return False
+
+    if not mark_paid(order_id):
+        db.session.rollback()
+        print(
+            f"Stripe session {session.get('id')} paid for order {order_id}, "
+            "which is no longer awaiting payment"
+        )
+        return False
+    db.session.commit()
+    return True
+
+
+def confirm_checkout_session(session_id: str) -> bool:
+    """Look a Checkout Session up at Stripe and confirm it if it's paid."""
+    try:
+        session = stripe.checkout.Session.retrieve(session_id)
+    except Exception as e:
+        # The webhook confirms it later
+        print("Stripe session lookup failed:", e)
+        return False
+    return confirm_paid_session(session)
+
 
 @payment_bp.route("/checkout", methods=["POST"])
 @jwt_required()
 def create_checkout_session():
-    # Get current user from JWT
-    current_user_email = get_jwt_identity()
-
-    # Ensure user exists
-    user = User.query.filter_by(email=current_user_email).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
+    # Write back any cart changes still held by the cart store
+    get_cart_store().flush(current_user.id)
 
     # Fetch cart items for this user
-    cart_items = CartItem.query.filter_by(user_id=user.id).all()
+    cart_items = CartItem.query.filter_by(user_id=current_user.id).all()
     if not cart_items:
         return jsonify({"error": "cart is empty"}), 400
 
@@ -49,14 +93,16 @@ def create_checkout_session():
             }
         )
 
-    # Create local Order record
+    # Create local Order record, holding its stock until the reservation
+    # runs out
     order = Order(
-        user_id=user.id,
+        user_id=current_user.id,
         payment_status="pending",
         total_price=total_price,
+        reserved_until=reservation_deadline(),
     )
     db.session.add(order)
-    db.session.commit()
+    db.session.flush()
 
     # Create OrderItem rows
     for item in cart_items:
@@ -68,7 +114,19 @@ def create_checkout_session():
         )
         db.session.add(order_item)
 
+    # Reserve stock for every line or none of them
+    lines = {item.product_id: item.quantity for item in cart_items}
+    try:
+        catalog_changed = reserve_stock(lines)
+    except OutOfStock:
+        db.session.rollback()
+        return jsonify(
+            {"error": "insufficient stock", "product_ids": short_products(lines)}
+        ), 409
+
     db.session.commit()
+    if catalog_changed:
+        catalog_cache.bump_version()
 
     try:
         # Create Stripe Checkout Session
@@ -76,14 +134,22 @@ def create_checkout_session():
             payment_method_types=["card"],
             line_items=line_items,
             mode="payment",
-            success_url=f"http://localhost:5000/order/confirmed?order_id={order.id}",
+            success_url=(
+                f"http://localhost:5000/order/confirmed?order_id={order.id}"
+                "&session_id={CHECKOUT_SESSION_ID}"
+            ),
             cancel_url=f"http://localhost:5000/order/failed?order_id={order.id}",
             metadata={
                 "order_id": str(order.id),
-                "user_id": str(user.id),
+                "user_id": str(current_user.id),
             },
         )
     except Exception as e:
+        # No payment can happen; give the stock back
+        release_order(order.id)
+        order.payment_status = "failed"
+        db.session.commit()
+        catalog_cache.bump_version()
         return jsonify({"error": f"Stripe error: {str(e)}"}), 500
 
     # Clear user's cart once session is created
@@ -98,3 +164,27 @@ def create_checkout_session():
             "order_id": order.id,
         }
     ), 200
+
+
+# POST /payments/webhook  (Stripe events)
+@payment_bp.route("/webhook", methods=["POST"])
+def stripe_webhook():
+    """
+    Confirms orders from checkout.session.completed events, so an order is
+    paid even if the customer never comes back to the success page.
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        return jsonify({"error": "webhook not configured"}), 404
+
+    try:
+        event = stripe.Webhook.construct_event(
+            request.get_data(),
+            request.headers.get("Stripe-Signature", ""),
+            STRIPE_WEBHOOK_SECRET,
+        )
+    except (ValueError, stripe.SignatureVerificationError):
+        return jsonify({"error": "invalid signature"}), 400
+
+    if event["type"] == "checkout.session.completed":
+        confirm_paid_session(event["data"]["object"])
+    return jsonify({"received": True}), 200
@@ -1,100 +1,688 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import base64
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import (
+    Blueprint,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
+from flask_jwt_extended import jwt_required
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import load_only
+from sqlalchemy.exc import SQLAlchemyError
 from extensions import db
-from models import Product, User
-import requests
+from models import Product
+from catalog_cache import catalog_cache
+from catalog_sync import syncer
+from inventory import spread_stock
+from search import search_products
 
 products_bp = Blueprint("products", __name__, url_prefix="/api")
 
 
-def fetchApiProducts():
+# Page size limits for GET /api/products
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Max ids accepted by GET /api/products?ids=...
+MAX_BATCH_IDS = 100
+
+# Range of the integer id column (32-bit on PostgreSQL); larger values
+# overflow the query parameter instead of just matching nothing
+MIN_ID = -(2**31)
+MAX_ID = 2**31 - 1
+
+# Rows per transaction for POST /api/products/bulk, and how many
+# per-line errors its summary lists
+DEFAULT_IMPORT_CHUNK = 500
+MAX_IMPORT_CHUNK = 5000
+MAX_IMPORT_ERRORS = 100
+
+# Rows fetched and written per batch when streaming the full catalog
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Cache-Control for public catalog responses: always revalidate via ETag
+CATALOG_CACHE_CONTROL = "public, no-cache"
+
+# Cache-Control for the storefront detail/category pages, which can be
+# served from browser or proxy caches for a few minutes
+STOREFRONT_CACHE_CONTROL = "public, max-age=300"
+
+# Serialized response kept in catalog_cache, with its validators
+CachedBody = namedtuple("CachedBody", "body etag last_modified next_cursor")
+
+
+def _encode_cursor(after: int) -> str:
     """
-    Sync products from DummyJSON into the local database.
-    If a product exists, update fields; otherwise, create it.
+    Opaque cursor for the next page: the last product id for the keyset
+    list, or the next offset for ranked search results.
     """
+    raw = json.dumps({"after": after}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    after = json.loads(base64.urlsafe_b64decode(padded))["after"]
+    if not isinstance(after, int):
+        raise ValueError("cursor id must be an integer")
+    # An id or an offset; bound it before it reaches a query parameter
+    if not 0 <= after <= MAX_ID:
+        raise ValueError("cursor out of range")
+    return after
+
+
+def _parse_bool(value: str):
+    value = value.strip().lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+
+def _parse_limit(args) -> int:
+    """Page size from the query string, capped at MAX_PAGE_SIZE."""
     try:
-        res = requests.get("https://dummyjson.com/products?limit=0")
-        res.raise_for_status()
-        data = res.json()
-    except Exception as e:
-        print("Error fetching DummyJSON products:", e)
-        return
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit <= 0:
+        raise ValueError("limit must be > 0")
+    return min(limit, MAX_PAGE_SIZE)
 
-    products = data.get("products", [])
-
-    for p in products:
-        name = p.get("title")
-        price = p.get("price", 0)
-        image_url = p.get("thumbnail", None)
-        description = p.get("description", "")
-        stock = p.get("stock", 0)
-
-        exists = Product.query.filter_by(name=name).first()
-        if exists:
-            exists.price = price
-            exists.image_url = image_url
-            exists.description = description
-            exists.available = True
-            exists.inventory = stock
-        else:
-            new_product = Product(
-                name=name,
-                price=price,
-                image_url=image_url,
-                description=description,
-                available=True,
-                inventory=stock,
-            )
-            db.session.add(new_product)
 
-    db.session.commit()
+def _parse_price(args, key: str) -> Decimal:
+    try:
+        return Decimal(args[key])
+    except InvalidOperation:
+        raise ValueError(f"{key} must be a number")
+
+
+def _product_filters(args) -> list:
+    """
+    Build SQL filters from the list query string.
+    Raises ValueError with a user-facing message on bad input.
+    """
+    filters = []
+
+    if "available" in args:
+        try:
+            filters.append(Product.available.is_(_parse_bool(args["available"])))
+        except ValueError:
+            raise ValueError("available must be true or false")
+
+    if "in_stock" in args:
+        try:
+            in_stock = _parse_bool(args["in_stock"])
+        except ValueError:
+            raise ValueError("in_stock must be true or false")
+        filters.append(Product.inventory > 0 if in_stock else Product.inventory == 0)
+
+    if args.get("category"):
+        filters.append(Product.category == args["category"])
+
+    if "min_price" in args:
+        filters.append(Product.price >= _parse_price(args, "min_price"))
+    if "max_price" in args:
+        filters.append(Product.price <= _parse_price(args, "max_price"))
+
+    return filters
+
+
+def _to_json_bytes(data) -> bytes:
+    # Same encoder and settings jsonify() uses, so cached bodies match
+    return current_app.json.dumps(data).encode()
+
+
+def _cached_body(data, product=None, next_cursor=None) -> CachedBody:
+    """
+    Serialize data once and derive its ETag. Only single-product bodies get
+    a Last-Modified (the product's own); a list can change without any of
+    its rows changing, e.g. when one is deleted, so lists rely on the ETag.
+    """
+    body = _to_json_bytes(data)
+    return CachedBody(
+        body=body,
+        etag=hashlib.sha1(body).hexdigest(),
+        last_modified=product.last_modified if product else None,
+        next_cursor=next_cursor,
+    )
 
 
-# GET /api/products  (list products)
+def _json_response(cached: CachedBody, cache_control: str):
+    """
+    Build a response from a cached body. Matching If-None-Match or
+    If-Modified-Since headers turn it into a 304 without re-serializing.
+    """
+    response = current_app.response_class(cached.body, mimetype="application/json")
+    response.set_etag(cached.etag)
+    if cached.last_modified:
+        response.last_modified = cached.last_modified
+    response.headers["Cache-Control"] = cache_control
+    return response.make_conditional(request)
+
+
+def _build_product_page(args) -> CachedBody:
+    """
+    Query one page of products and serialize it.
+    Raises ValueError on bad query params.
+    """
+    limit = _parse_limit(args)
+    fields = _parse_fields(args)
+    filters = _product_filters(args)
+
+    cursor = args.get("cursor")
+    if cursor:
+        try:
+            filters.append(Product.id > _decode_cursor(cursor))
+        except Exception:
+            raise ValueError("invalid cursor")
+
+    # Fetch one extra row to know whether another page exists
+    products = (
+        Product.query.options(*_load_only(fields))
+        .filter(*filters)
+        .order_by(Product.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    next_cursor = _encode_cursor(products[-1].id) if has_more else None
+    return _cached_body(
+        [product.to_dict(fields) for product in products], next_cursor=next_cursor
+    )
+
+
+def _build_search_page(query: str, limit: int, offset: int) -> CachedBody:
+    # Fetch one extra row to know whether another page exists
+    products = search_products(query, limit + 1, offset)
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    next_cursor = _encode_cursor(offset + limit) if has_more else None
+    return _cached_body(
+        [product.to_dict() for product in products], next_cursor=next_cursor
+    )
+
+
+def _build_product(product_id: int, fields=None):
+    product = (
+        Product.query.options(*_load_only(fields))
+        .filter(Product.id == product_id)
+        .first()
+    )
+    if not product:
+        return None
+    return _cached_body(product.to_dict(fields), product)
+
+
+def _product_response(product_id: int, cache_control: str):
+    """Single product body from the cache, shared by detail endpoints."""
+    try:
+        fields = _parse_fields(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cached = catalog_cache.get_or_build(
+        ("product", product_id, fields), lambda: _build_product(product_id, fields)
+    )
+    if cached is None:
+        return jsonify({"error": "product not found"}), 404
+
+    return _json_response(cached, cache_control)
+
+
+# GET /api/products  (list products, keyset paginated)
 @products_bp.route("/products", methods=["GET"])
 def list_products():
-    fetchApiProducts()
-    products = Product.query.all()
-    return jsonify([product.to_dict() for product in products]), 200
+    """
+    Return one page of products ordered by id, served from local data only;
+    the DummyJSON sync runs in catalog_sync.
 
+    Query params: limit, cursor, category, available, in_stock, min_price,
+    max_price. The body stays a JSON list; when more rows exist the opaque
+    cursor for the next page is sent in the X-Next-Cursor and Link headers.
+    Pages are cached as JSON bytes until the catalog version changes and
+    carry an ETag so revalidation can return 304.
+
+    With ?ids=1,2,3 it becomes a batch lookup instead (see _batch_response).
+    Accept: application/x-ndjson or ?stream=1 streams the whole filtered
+    catalog instead of one page (see _stream_products).
+    """
+    if "ids" in request.args:
+        return _batch_response(request.args["ids"])
+
+    wants_ndjson = (
+        request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        == NDJSON_MIMETYPE
+    )
+    if wants_ndjson or request.args.get("stream") in ("1", "true"):
+        return _stream_products(request.args, ndjson=wants_ndjson)
+
+    return _product_page_response(request.args, CATALOG_CACHE_CONTROL)
+
+
+def _stream_products(args, ndjson: bool):
+    """
+    Stream every product matching the list filters, in id order, as a JSON
+    array or as NDJSON. Rows are read STREAM_BATCH_SIZE at a time with
+    yield_per and written out per batch, so memory stays bounded by the
+    batch size and the first bytes go out after the first batch.
+    """
+    try:
+        fields = _parse_fields(args)
+        filters = _product_filters(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    statement = (
+        select(Product)
+        .options(*_load_only(fields))
+        .where(*filters)
+        .order_by(Product.id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+
+    def generate():
+        first = True
+        if not ndjson:
+            yield b"["
+        for batch in db.session.execute(statement).scalars().partitions():
+            encoded = [_to_json_bytes(product.to_dict(fields)) for product in batch]
+            if ndjson:
+                yield b"\n".join(encoded) + b"\n"
+            else:
+                yield (b"" if first else b",") + b",".join(encoded)
+            first = False
+        if not ndjson:
+            yield b"]"
+
+    mimetype = NDJSON_MIMETYPE if ndjson else "application/json"
+    return current_app.response_class(
+        stream_with_context(generate()), mimetype=mimetype
+    )
+
+
+def _parse_fields(args):
+    """
+    ?fields=id,name,price as a tuple in to_dict() order, or None for every
+    field. Raises ValueError for names Product doesn't serialize.
+    """
+    raw = args.get("fields")
+    if raw is None:
+        return None
+
+    requested = {field.strip() for field in raw.split(",") if field.strip()}
+    if not requested:
+        raise ValueError("fields must not be empty")
+    unknown = requested - set(Product.SERIALIZED_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    return tuple(f for f in Product.SERIALIZED_FIELDS if f in requested)
+
+
+def _load_only(fields) -> list:
+    """
+    Loader options that fetch only the requested columns, plus the
+    timestamps _cached_body needs for Last-Modified.
+    """
+    if fields is None:
+        return []
+    columns = set(fields) | {"created_at", "updated_at"}
+    return [
+        load_only(
+            *[getattr(Product, f) for f in Product.SERIALIZED_FIELDS if f in columns]
+        )
+    ]
 
-# POST /api/products  (add product)
-@products_bp.route("/products", methods=["POST"])
-@jwt_required()
-def create_product():
-    data = request.get_json() or {}
+
+def _parse_ids(raw: str) -> list:
+    """Comma-separated ids in request order, without duplicates."""
+    ids = []
+    seen = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            product_id = int(part)
+        except ValueError:
+            raise ValueError("ids must be comma-separated integers")
+        if not MIN_ID <= product_id <= MAX_ID:
+            raise ValueError(f"ids must be between {MIN_ID} and {MAX_ID}")
+        if product_id not in seen:
+            seen.add(product_id)
+            ids.append(product_id)
+
+    if not ids:
+        raise ValueError("ids required")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"at most {MAX_BATCH_IDS} ids allowed")
+    return ids
+
+
+def _batch_response(raw_ids: str):
+    """
+    Resolve many products at once. Each product body comes from the same
+    cache entries as get_product; the misses are loaded with one IN query.
+    Returns {"products": [...in request order], "missing": [ids]}.
+    """
+    try:
+        ids = _parse_ids(raw_ids)
+        fields = _parse_fields(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    version = catalog_cache.version
+    found = {}
+    for product_id in ids:
+        cached = catalog_cache.get(("product", product_id, fields))
+        if cached is not None:
+            found[product_id] = cached
+
+    to_load = [product_id for product_id in ids if product_id not in found]
+    if to_load:
+        products = Product.query.options(*_load_only(fields)).filter(
+            Product.id.in_(to_load)
+        )
+        for product in products:
+            cached = _cached_body(product.to_dict(fields), product)
+            catalog_cache.set(("product", product.id, fields), cached, version)
+            found[product.id] = cached
+
+    entries = [found[product_id] for product_id in ids if product_id in found]
+    missing = [product_id for product_id in ids if product_id not in found]
+
+    # Splice the cached bodies together instead of re-serializing them
+    body = (
+        b'{"missing":'
+        + _to_json_bytes(missing)
+        + b',"products":['
+        + b",".join(entry.body for entry in entries)
+        + b"]}"
+    )
+    batch = CachedBody(
+        body=body,
+        etag=hashlib.sha1(body).hexdigest(),
+        last_modified=None,
+        next_cursor=None,
+    )
+    return _json_response(batch, CATALOG_CACHE_CONTROL)
+
+
+def _product_page_response(args, cache_control: str):
+    key = ("list", tuple(sorted(args.items(multi=True))))
+    try:
+        cached = catalog_cache.get_or_build(key, lambda: _build_product_page(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = _json_response(cached, cache_control)
+    if cached.next_cursor:
+        next_args = args.to_dict()
+        next_args["cursor"] = cached.next_cursor
+        response.headers["X-Next-Cursor"] = cached.next_cursor
+        response.headers["Link"] = (
+            f'<{url_for("products.list_products", **next_args)}>; rel="next"'
+        )
+
+    return response
+
+
+# GET /api/products/category/<category>  (storefront category listing)
+@products_bp.route("/products/category/<category>", methods=["GET"])
+def list_category(category):
+    args = request.args.copy()
+    args["category"] = category
+    return _product_page_response(args, STOREFRONT_CACHE_CONTROL)
+
+
+# GET /api/products/<id>/detail  (public storefront product detail)
+@products_bp.route("/products/<int:product_id>/detail", methods=["GET"])
+def product_detail(product_id):
+    # Shares its cache entry with get_product, only the headers differ
+    return _product_response(product_id, STOREFRONT_CACHE_CONTROL)
+
+
+# GET /api/products/search  (full-text search)
+@products_bp.route("/products/search", methods=["GET"])
+def search_products_route():
+    """
+    Rank products matching ?q= with bm25 over name and description.
+    Paged like the list: limit plus an opaque cursor in X-Next-Cursor.
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "q required"}), 400
+
+    try:
+        limit = _parse_limit(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cursor = request.args.get("cursor")
+    try:
+        offset = _decode_cursor(cursor) if cursor else 0
+    except Exception:
+        return jsonify({"error": "invalid cursor"}), 400
+
+    cached = catalog_cache.get_or_build(
+        ("search", query, limit, offset),
+        lambda: _build_search_page(query, limit, offset),
+    )
+
+    response = _json_response(cached, CATALOG_CACHE_CONTROL)
+    if cached.next_cursor:
+        response.headers["X-Next-Cursor"] = cached.next_cursor
+    return response
+
+
+def _validate_new_product(data) -> dict:
+    """
+    Validate a new product payload; shared by create_product and the bulk
+    import so both accept exactly the same rows.
+    Returns Product column values, raises ValueError with the API error.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("product must be a JSON object")
 
     name = data.get("name")
     price = data.get("price")
-    image_url = data.get("image_url")
-    inventory = data.get("inventory", 0)
+    if not name or price is None:
+        raise ValueError("name required")
+    if not isinstance(name, str):
+        raise ValueError("name must be a string")
+
+    # Checked here rather than left to the database, so a bad row is
+    # reported on its own line instead of failing its whole import chunk
+    for field in ("image_url", "description", "category"):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"{field} must be a string")
+
     available = data.get("available", True)
-    description = data.get("description")
+    if not isinstance(available, bool):
+        raise ValueError("available must be true or false")
 
-    if not name or price is None:
-        return jsonify({"error": "name required"}), 400
+    try:
+        price = Decimal(str(price))
+    except InvalidOperation:
+        raise ValueError("price must be a number")
+    if not price.is_finite() or price < 0:
+        raise ValueError("price must be >= 0")
 
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
+    try:
+        inventory = int(data.get("inventory", 0))
+    except (TypeError, ValueError):
+        raise ValueError("inventory should be an integer")
+    if inventory < 0:
+        raise ValueError("inventory must be >= 0")
+
+    return {
+        "name": name,
+        "price": price,
+        "image_url": data.get("image_url"),
+        "inventory": inventory,
+        "available": available,
+        "description": data.get("description"),
+        "category": data.get("category"),
+    }
+
+
+def _import_chunk(rows: list, mode: str, summary: dict) -> None:
+    """
+    Write one chunk of validated (line_no, fields, keys) rows in a single
+    transaction; keys are the fields the line actually gave. In upsert mode
+    rows are matched to existing products by name with one IN query, and
+    only their given keys are updated; the last row wins for repeated
+    names. Like PUT /api/products/<id>, a sharded product's new inventory
+    is spread over its slots. If the chunk fails, its rows are retried one
+    per transaction.
+    """
+    inserts = [fields for _, fields, _ in rows]
+    updates = []
+    restocks = {}
+
+    if mode == "upsert":
+        by_name = {fields["name"]: (fields, keys) for _, fields, keys in rows}
+        existing = {}
+        matches = db.session.execute(
+            select(Product.id, Product.name, Product.sharded)
+            .where(Product.name.in_(list(by_name)))
+            .order_by(Product.id)
+        )
+        for product_id, name, sharded in matches:
+            existing.setdefault(name, (product_id, sharded))
+
+        now = datetime.utcnow()
+        inserts = [f for name, (f, _) in by_name.items() if name not in existing]
+        for name, (fields, keys) in by_name.items():
+            if name not in existing:
+                continue
+            product_id, sharded = existing[name]
+            row = {key: fields[key] for key in keys}
+            if sharded and "inventory" in row:
+                restocks[product_id] = row.pop("inventory")
+            updates.append({**row, "id": product_id, "updated_at": now})
 
     try:
-        inventory = int(inventory)
-    except Exception:
-        return jsonify({"error": "inventory should be an integer"}), 400
-
-    new_product = Product(
-        name=name,
-        price=price,
-        image_url=image_url,
-        inventory=inventory,
-        available=available,
-        description=description,
-    )
+        if inserts:
+            db.session.execute(insert(Product), inserts)
+        if updates:
+            db.session.execute(update(Product), updates)
+        for product_id, inventory in restocks.items():
+            product = db.session.get(Product, product_id)
+            spread_stock(product, inventory, len(product.inventory_slots))
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(rows) > 1:
+            # Retry one row per transaction so only the bad rows fail
+            for row in rows:
+                _import_chunk([row], mode, summary)
+            return
+
+        message = f"database error: {e.__class__.__name__}"
+        summary["failed"] += len(rows)
+        for line_no, *_ in rows:
+            _record_import_error(summary, line_no, message)
+        return
+
+    summary["inserted"] += len(inserts)
+    summary["updated"] += len(updates)
+
+
+def _record_import_error(summary: dict, line_no: int, message: str) -> None:
+    if len(summary["errors"]) < MAX_IMPORT_ERRORS:
+        summary["errors"].append({"line": line_no, "error": message})
+
+
+# POST /api/products/bulk  (NDJSON bulk import)
+@products_bp.route("/products/bulk", methods=["POST"])
+@jwt_required()
+def bulk_import_products():
+    """
+    Import products from an NDJSON body, one product object per line.
+
+    The body is read line by line from the request stream and written in
+    chunks of ?chunk_size= rows per transaction, so memory stays flat for
+    large catalogs. ?mode=upsert updates existing products by name instead
+    of always inserting. Invalid lines are skipped and reported; the first
+    MAX_IMPORT_ERRORS errors are listed with their line numbers.
+    """
+    try:
+        chunk_size = int(request.args.get("chunk_size", DEFAULT_IMPORT_CHUNK))
+    except ValueError:
+        return jsonify({"error": "chunk_size must be an integer"}), 400
+    if chunk_size <= 0:
+        return jsonify({"error": "chunk_size must be > 0"}), 400
+    chunk_size = min(chunk_size, MAX_IMPORT_CHUNK)
+
+    mode = request.args.get("mode", "insert")
+    if mode not in ("insert", "upsert"):
+        return jsonify({"error": "mode must be insert or upsert"}), 400
+
+    summary = {"inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    chunk = []
+
+    for line_no, line in enumerate(request.stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            data = json.loads(line)
+            fields = _validate_new_product(data)
+        except json.JSONDecodeError:
+            summary["failed"] += 1
+            _record_import_error(summary, line_no, "invalid JSON")
+            continue
+        except ValueError as e:
+            summary["failed"] += 1
+            _record_import_error(summary, line_no, str(e))
+            continue
+
+        chunk.append((line_no, fields, fields.keys() & data.keys()))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, mode, summary)
+            chunk = []
+
+    if chunk:
+        _import_chunk(chunk, mode, summary)
+
+    if summary["inserted"] or summary["updated"]:
+        catalog_cache.bump_version()
+
+    return jsonify(summary), 200
+
+
+# POST /api/products  (add product)
+@products_bp.route("/products", methods=["POST"])
+@jwt_required()
+def create_product():
+    data = request.get_json() or {}
+
+    try:
+        fields = _validate_new_product(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    new_product = Product(**fields)
 
     db.session.add(new_product)
     db.session.commit()
+    catalog_cache.bump_version()
 
     return jsonify(new_product.to_dict()), 201
 
@@ -103,22 +691,13 @@ def create_product():
 @products_bp.route("/products/<int:product_id>", methods=["GET"])
 @jwt_required()
 def get_product(product_id):
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"error": "product not found"}), 404
-
-    return jsonify(product.to_dict()), 200
+    return _product_response(product_id, "private, no-cache")
 
 
 # PUT /api/products/<id>  (update)
 @products_bp.route("/products/<int:product_id>", methods=["PUT"])
 @jwt_required()
 def update_product(product_id):
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     product = Product.query.get(product_id)
     if not product:
         return jsonify({"error": "not found"}), 404
@@ -133,15 +712,23 @@ def update_product(product_id):
         product.image_url = data["image_url"]
     if "inventory" in data:
         try:
-            product.inventory = int(data["inventory"])
+            inventory = int(data["inventory"])
         except Exception:
             return jsonify({"error": "inventory should be integer"}), 400
+        if product.sharded:
+            # Re-split the new stock over the product's existing slots
+            spread_stock(product, inventory, len(product.inventory_slots))
+        else:
+            product.inventory = inventory
     if "available" in data:
         product.available = data["available"]
     if "description" in data:
         product.description = data["description"]
+    if "category" in data:
+        product.category = data["category"]
 
     db.session.commit()
+    catalog_cache.bump_version()
     return jsonify(product.to_dict()), 200
 
 
@@ -149,15 +736,30 @@ def update_product(product_id):
 @products_bp.route("/products/<int:product_id>", methods=["DELETE"])
 @jwt_required()
 def delete_product(product_id):
-    current_username = get_jwt_identity()
-    user = User.query.filter_by(email=current_username).first()
-    if not user:
-        return jsonify({"error": "user not found"}), 404
-
     product = Product.query.get(product_id)
     if not product:
         return jsonify({"error": "not found"}), 404
 
     db.session.delete(product)
     db.session.commit()
+    catalog_cache.bump_version()
     return jsonify({"message": "deleted"}), 200
+
+
+# POST /api/products/sync  (trigger a DummyJSON catalog sync)
+@products_bp.route("/products/sync", methods=["POST"])
+@jwt_required()
+def sync_products():
+    result = syncer.run_once()
+    if result["status"] == "in_progress":
+        return jsonify(syncer.status()), 409
+    if result["status"] == "error":
+        return jsonify({"error": "sync failed", **syncer.status()}), 502
+
+    return jsonify(syncer.status()), 200
+
+
+# GET /api/products/sync  (last sync status)
+@products_bp.route("/products/sync", methods=["GET"])
+def sync_status():
+    return jsonify(syncer.status()), 200
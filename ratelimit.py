@@ -0,0 +1,197 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, request
+
+from lru import LRUCache
+
+# Token buckets for the password-checking auth endpoints: BURST attempts
+# at once, refilled at PER_MINUTE per minute
+RATELIMIT_IP_BURST = int(os.getenv("RATELIMIT_IP_BURST", "20"))
+RATELIMIT_IP_PER_MINUTE = float(os.getenv("RATELIMIT_IP_PER_MINUTE", "20"))
+RATELIMIT_ACCOUNT_BURST = int(os.getenv("RATELIMIT_ACCOUNT_BURST", "5"))
+RATELIMIT_ACCOUNT_PER_MINUTE = float(os.getenv("RATELIMIT_ACCOUNT_PER_MINUTE", "5"))
+
+# SQLite file shared by all workers; unset keeps buckets in process memory
+RATELIMIT_STORAGE_PATH = os.getenv("RATELIMIT_STORAGE_PATH")
+
+# Max buckets kept by the in-memory store
+RATELIMIT_MAX_KEYS = 100_000
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: int):
+    """
+    Take one token from a bucket. Returns (tokens, retry_after) where
+    retry_after is 0 if the token was granted, else seconds until it would be.
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets in a bounded in-process LRU; each worker limits on its own."""
+
+    def __init__(self, max_keys: int = RATELIMIT_MAX_KEYS):
+        self._buckets = LRUCache(max_keys)
+
+    @property
+    def max_keys(self) -> int:
+        return self._buckets.maxsize
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._buckets.lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            self._buckets.set(key, (tokens, now))
+        return retry_after
+
+
+class SqliteBucketStore:
+    """
+    Buckets in a SQLite file so every worker on the host shares them.
+    Each take is one short IMMEDIATE transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        # Wall-clock time, since buckets are shared between processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE "
+                "SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+class AuthRateLimiter:
+    """
+    Per-IP and per-account token buckets for endpoints that verify a
+    password hash. Checked before any user lookup or hashing, so a
+    credential-stuffing burst costs a dict (or SQLite) update per request
+    instead of a PBKDF2/scrypt run.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.ip_burst = RATELIMIT_IP_BURST
+        self.ip_rate = RATELIMIT_IP_PER_MINUTE / 60
+        self.account_burst = RATELIMIT_ACCOUNT_BURST
+        self.account_rate = RATELIMIT_ACCOUNT_PER_MINUTE / 60
+        self.store = MemoryBucketStore()
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def init_app(self, app) -> None:
+        get = app.config.get
+        self.enabled = get("RATELIMIT_ENABLED", True)
+        self.ip_burst = get("RATELIMIT_IP_BURST", RATELIMIT_IP_BURST)
+        self.ip_rate = get("RATELIMIT_IP_PER_MINUTE", RATELIMIT_IP_PER_MINUTE) / 60
+        self.account_burst = get("RATELIMIT_ACCOUNT_BURST", RATELIMIT_ACCOUNT_BURST)
+        self.account_rate = (
+            get("RATELIMIT_ACCOUNT_PER_MINUTE", RATELIMIT_ACCOUNT_PER_MINUTE) / 60
+        )
+
+        path = get("RATELIMIT_STORAGE_PATH", RATELIMIT_STORAGE_PATH)
+        self.store = SqliteBucketStore(path) if path else MemoryBucketStore()
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        with self._lock:
+            self.allowed = 0
+            self.throttled_ip = 0
+            self.throttled_account = 0
+
+    def check(self, endpoint: str, ip: str, account: str = None) -> float:
+        """Returns 0 if the attempt may proceed, else seconds to wait."""
+        if not self.enabled:
+            return 0.0
+
+        retry_after = self.store.take(
+            f"{endpoint}:ip:{ip}", self.ip_rate, self.ip_burst
+        )
+        if retry_after:
+            with self._lock:
+                self.throttled_ip += 1
+            return retry_after
+
+        if account:
+            retry_after = self.store.take(
+                f"{endpoint}:account:{account.strip().lower()}",
+                self.account_rate,
+                self.account_burst,
+            )
+            if retry_after:
+                with self._lock:
+                    self.throttled_account += 1
+                return retry_after
+
+        with self._lock:
+            self.allowed += 1
+        return 0.0
+
+    def limit(self, view):
+        """Decorator: 429 + Retry-After when the caller's bucket is empty."""
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            email = data.get("email") if isinstance(data, dict) else None
+            if not isinstance(email, str):
+                email = None
+
+            retry_after = self.check(request.endpoint, request.remote_addr, email)
+            if retry_after:
+                resp = jsonify({"error": "too many attempts, try again later"})
+                resp.headers["Retry-After"] = str(math.ceil(retry_after))
+                return resp, 429
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "throttled_ip": self.throttled_ip,
+                "throttled_account": self.throttled_account,
+            }
+
+
+# Shared limiter for /auth/login and /auth/forgot-password
+auth_limiter = AuthRateLimiter()
@@ -0,0 +1,112 @@
+import re
+
+from sqlalchemy import DDL, event, text
+
+from extensions import db
+from models import Product
+
+# External-content FTS5 index over products(name, description). SQLite
+# triggers keep it in sync with every insert/update/delete, including the
+# bulk writes done by the catalog sync and the bulk import.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, content='products', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# Matches in the name count ten times as much as matches in the description
+SEARCH_SQL = text(
+    """
+    SELECT products.* FROM products_fts
+    JOIN products ON products.id = products_fts.rowid
+    WHERE products_fts MATCH :query
+    ORDER BY bm25(products_fts, 10.0, 1.0), products.id
+    LIMIT :limit OFFSET :offset
+    """
+)
+
+for statement in SEARCH_INDEX_DDL:
+    event.listen(
+        Product.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    Product.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"),
+)
+
+
+def _uses_fts() -> bool:
+    return db.engine.dialect.name == "sqlite"
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word is quoted (so
+    operators and punctuation in user input can't break the syntax) and
+    prefix-matched, and all words must match.
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_products(query: str, limit: int, offset: int = 0) -> list:
+    """Return products matching query, best bm25 rank first."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    if not _uses_fts():
+        # Other databases get a plain substring match in id order
+        pattern = f"%{query.strip()}%"
+        return (
+            Product.query.filter(
+                Product.name.ilike(pattern) | Product.description.ilike(pattern)
+            )
+            .order_by(Product.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    return (
+        Product.query.from_statement(SEARCH_SQL)
+        .params(query=expression, limit=limit, offset=offset)
+        .all()
+    )
+
+
+def rebuild_search_index() -> None:
+    """Create the index if it is missing and rebuild it from products."""
+    if not _uses_fts():
+        return
+
+    for statement in SEARCH_INDEX_DDL:
+        db.session.execute(text(statement))
+    db.session.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    db.session.commit()
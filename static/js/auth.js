@@ -0,0 +1,78 @@
+// Shared token handling for pages that call the API.
+//
+// Access tokens are short-lived. authFetch() sends the current one and, on
+// a 401, trades the stored refresh token for a new pair at /auth/refresh
+// (once, shared by concurrent calls) and retries the request.
+
+let refreshInFlight = null;
+
+function saveTokens(data) {
+  if (data.access_token) localStorage.setItem("access_token", data.access_token);
+  if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token);
+}
+
+function clearTokens() {
+  localStorage.removeItem("access_token");
+  localStorage.removeItem("refresh_token");
+}
+
+// Revoke this session's tokens on the server, then forget them locally
+async function logout() {
+  const accessToken = localStorage.getItem("access_token");
+  const refreshToken = localStorage.getItem("refresh_token");
+
+  if (accessToken) {
+    try {
+      await fetch("/auth/logout", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "Authorization": "Bearer " + accessToken,
+        },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      });
+    } catch (err) {
+      console.log(err);
+    }
+  }
+  clearTokens();
+}
+
+async function refreshTokens() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return false;
+
+  if (!refreshInFlight) {
+    refreshInFlight = fetch("/auth/refresh", {
+      method: "POST",
+      headers: { "Authorization": "Bearer " + refreshToken },
+    })
+      .then(async (resp) => {
+        if (!resp.ok) {
+          clearTokens();
+          return false;
+        }
+        saveTokens(await resp.json());
+        return true;
+      })
+      .catch(() => false)
+      .finally(() => {
+        refreshInFlight = null;
+      });
+  }
+  return refreshInFlight;
+}
+
+async function authFetch(url, options = {}) {
+  const withToken = () => ({
+    ...options,
+    headers: {
+      ...(options.headers || {}),
+      "Authorization": "Bearer " + localStorage.getItem("access_token"),
+    },
+  });
+
+  const resp = await fetch(url, withToken());
+  if (resp.status !== 401 || !(await refreshTokens())) return resp;
+  return fetch(url, withToken());
+}
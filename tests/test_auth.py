@@ -232,4 +232,192 @@ def test_forgot_password_success_allows_login_with_new_password(client):
     assert login_data is not None
     assert "access_token" in login_data
     assert isinstance(login_data["access_token"], str)
-    assert login_data["access_token"]
\ No newline at end of file
+    assert login_data["access_token"]
+
+#-----------------
+# Token Claims / Current User Tests
+#-----------------
+
+def register_and_login(client, email, password="Password123!"):
+    client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "phone_number": None,
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Fluffy",
+        },
+    )
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    assert resp.status_code == 200
+    return resp.get_json()["access_token"]
+
+
+def test_login_token_carries_user_id_and_version(client):
+    from flask_jwt_extended import decode_token
+
+    token = register_and_login(client, "claims@example.com")
+
+    claims = decode_token(token)
+    assert claims["sub"] == "claims@example.com"
+    assert isinstance(claims["uid"], int)
+    assert claims["tv"] == 0
+
+
+def test_protected_requests_do_not_query_users(app, client):
+    from sqlalchemy import event
+    from extensions import db
+
+    token = register_and_login(client, "noquery@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # First request resolves the user and warms the cache
+    assert client.get("/api/cart", headers=headers).status_code == 200
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/api/cart", headers=headers).status_code == 200
+        assert client.get("/api/orders", headers=headers).status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert statements
+    assert not [s for s in statements if "FROM users" in s]
+
+
+def test_forgot_password_revokes_existing_tokens(client):
+    token = register_and_login(client, "revoke@example.com", "OldPass123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/cart", headers=headers).status_code == 200
+
+    resp = client.post(
+        "/auth/forgot-password",
+        json={
+            "email": "revoke@example.com",
+            "security_answer": "Fluffy",
+            "new_password": "NewPass123!",
+            "confirm_password": "NewPass123!",
+        },
+    )
+    assert resp.status_code == 200
+
+    # Tokens issued before the reset no longer work
+    assert client.get("/api/cart", headers=headers).status_code == 401
+
+    token = register_and_login(client, "revoke@example.com", "NewPass123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/cart", headers=headers).status_code == 200
+
+
+#-----------------
+# Refresh Token Tests
+#-----------------
+
+def login_tokens(client, email, password="Password123!"):
+    register_and_login(client, email, password)
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    return resp.get_json()
+
+
+def test_login_returns_refresh_token(client):
+    from flask_jwt_extended import decode_token
+
+    tokens = login_tokens(client, "refresh@example.com")
+
+    refresh = decode_token(tokens["refresh_token"])
+    assert refresh["type"] == "refresh"
+    assert isinstance(refresh["uid"], int)
+
+    # Access tokens are short-lived now that they can be renewed
+    access = decode_token(tokens["access_token"])
+    assert access["exp"] - access["iat"] <= 15 * 60
+
+
+def test_refresh_rotates_tokens_without_hashing(client, monkeypatch):
+    import passwords
+
+    tokens = login_tokens(client, "rotate@example.com")
+
+    def no_hashing(fn, *args):
+        raise AssertionError("refresh must not hash passwords")
+
+    monkeypatch.setattr(passwords.password_hasher, "run", no_hashing)
+
+    old_refresh = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    resp = client.post("/auth/refresh", headers=old_refresh)
+    assert resp.status_code == 200
+    new_tokens = resp.get_json()
+
+    headers = {"Authorization": f"Bearer {new_tokens['access_token']}"}
+    assert client.get("/api/cart", headers=headers).status_code == 200
+
+    # A refresh token works only once
+    assert client.post("/auth/refresh", headers=old_refresh).status_code == 401
+
+    new_refresh = {"Authorization": f"Bearer {new_tokens['refresh_token']}"}
+    assert client.post("/auth/refresh", headers=new_refresh).status_code == 200
+
+
+def test_refresh_rejects_access_tokens(client):
+    tokens = login_tokens(client, "wrongtype@example.com")
+
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/auth/refresh", headers=headers).status_code == 422
+
+
+#-----------------
+# Logout / Revocation Tests
+#-----------------
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    tokens = login_tokens(client, "logout@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    resp = client.post(
+        "/auth/logout",
+        headers=headers,
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert resp.status_code == 200
+
+    assert client.get("/api/cart", headers=headers).status_code == 401
+    refresh_headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert client.post("/auth/refresh", headers=refresh_headers).status_code == 401
+
+
+def test_revocations_survive_restart(client):
+    from blocklist import token_blocklist
+    from models import RevokedToken
+
+    tokens = login_tokens(client, "persist@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert RevokedToken.query.count() == 1
+
+    # Drop the in-process copy as a restart (or another worker) would
+    token_blocklist.clear()
+    assert len(token_blocklist) == 0
+
+    assert client.get("/api/cart", headers=headers).status_code == 401
+    assert len(token_blocklist) == 1
+
+
+def test_blocklist_purges_expired_revocations(app):
+    import time
+    from blocklist import token_blocklist
+    from models import RevokedToken
+
+    assert token_blocklist.revoke("expired-jti", time.time() - 1)
+    assert token_blocklist.revoke("live-jti", time.time() + 60)
+    assert not token_blocklist.is_revoked("expired-jti")
+    assert token_blocklist.is_revoked("live-jti")
+
+    token_blocklist.purge()
+    assert [row.jti for row in RevokedToken.query.all()] == ["live-jti"]
+    assert len(token_blocklist) == 1
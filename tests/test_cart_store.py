@@ -0,0 +1,241 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import delete, event
+
+import cart_store
+from cart_store import CartFlushError, MemoryCartStore, SqlCartStore
+from extensions import db
+from models import CartItem, Product
+
+
+def register_and_login(client):
+    email = f"user_{uuid4().hex}@example.com"
+    password = "Password123!"
+
+    resp = client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "phone_number": "1234567890",
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Billy",
+        },
+    )
+    assert resp.status_code == 201
+
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+
+
+@pytest.fixture()
+def store(app):
+    store = MemoryCartStore(interval=60)
+    app.extensions["cart_store"] = store
+    yield store
+    store.stop()
+
+
+@pytest.fixture()
+def products(app):
+    db.session.add(Product(id=1, name="Mascara", price=9.99, inventory=10))
+    db.session.add(Product(id=2, name="Palette", price=19.5, inventory=10))
+    db.session.add(Product(id=3, name="Retired", price=5, available=False))
+    db.session.commit()
+
+
+class StatementLog:
+    """Records the SQL the engine runs while active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self.record)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self.record)
+
+
+def test_sql_store_is_default(app):
+    assert isinstance(app.extensions["cart_store"], SqlCartStore)
+    assert not isinstance(app.extensions["cart_store"], MemoryCartStore)
+
+
+def test_memory_store_absorbs_repeated_adds(client, store, products):
+    headers = register_and_login(client)
+
+    with StatementLog() as statements:
+        for _ in range(5):
+            resp = client.post(
+                "/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers
+            )
+            assert resp.status_code == 201
+
+    assert resp.get_json()["quantity"] == 10
+    # The new line is written at once; the four repeat adds stay in memory
+    assert statements.count("INSERT") == 1 and "UPDATE" not in statements
+    assert [c.quantity for c in CartItem.query.all()] == [2]
+    assert store.pending() == 1
+
+
+def test_memory_store_rejects_unavailable_product(client, store, products):
+    headers = register_and_login(client)
+
+    resp = client.post("/api/cart", json={"product_id": 3}, headers=headers)
+    assert resp.status_code == 400
+    assert store.pending() == 0
+
+
+def test_list_cart_reads_own_writes(client, store, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 3}, headers=headers)
+    client.patch(
+        "/api/cart",
+        json={"operations": [{"op": "add", "product_id": 2, "quantity": 1}]},
+        headers=headers,
+    )
+
+    resp = client.get("/api/cart", headers=headers)
+    assert resp.status_code == 200
+    items = {i["product_id"]: i["quantity"] for i in resp.get_json()}
+    assert items == {1: 3, 2: 1}
+    assert all(i["id"] is not None for i in resp.get_json())
+    assert store.pending() == 0
+
+    resp = client.get("/api/cart?expand=product", headers=headers)
+    assert resp.get_json()["subtotal"] == 49.47
+
+
+def test_update_and_delete_flushed_lines(client, store, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1}, headers=headers)
+    client.post("/api/cart", json={"product_id": 2}, headers=headers)
+    items = client.get("/api/cart", headers=headers).get_json()
+    ids = {i["product_id"]: i["id"] for i in items}
+
+    resp = client.put(f"/api/cart/{ids[1]}", json={"quantity": 7}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["quantity"] == 7
+
+    resp = client.delete(f"/api/cart/{ids[2]}", headers=headers)
+    assert resp.status_code == 200
+
+    resp = client.delete(f"/api/cart/{ids[2]}", headers=headers)
+    assert resp.status_code == 404
+
+    store.flush()
+    assert {(c.product_id, c.quantity) for c in CartItem.query.all()} == {(1, 7)}
+
+
+def test_checkout_sees_pending_cart(client, store, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 201
+    assert resp.get_json()["total_price"] == "19.98"
+
+
+def test_flush_all_writes_every_user(app, store, products):
+    store.add(101, 1, 1)
+    store.add(102, 2, 4)
+    store.add(101, 1, 1)
+    store.add(102, 2, 1)
+    assert store.pending() == 2
+
+    store.flush()
+
+    rows = {(c.user_id, c.product_id, c.quantity) for c in CartItem.query.all()}
+    assert rows == {(101, 1, 2), (102, 2, 5)}
+    assert store.stats()["pending"] == 0
+    # One write for each new line, one for each user's repeat add
+    assert store.stats()["flushes"] == 4
+
+
+def test_new_lines_are_addressable_before_a_flush(client, store, products):
+    headers = register_and_login(client)
+
+    resp = client.post("/api/cart", json={"product_id": 1}, headers=headers)
+    line = resp.get_json()
+    assert line["id"] is not None and line["created_at"] is not None
+
+    resp = client.put(f"/api/cart/{line['id']}", json={"quantity": 4}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json() == {**line, "quantity": 4}
+
+    resp = client.patch(
+        "/api/cart",
+        json={"operations": [{"op": "add", "product_id": 2, "quantity": 1}]},
+        headers=headers,
+    )
+    added = [i for i in resp.get_json() if i["product_id"] == 2][0]
+    resp = client.delete(f"/api/cart/{added['id']}", headers=headers)
+    assert resp.status_code == 200
+
+
+def test_failed_flush_rolls_back_and_drops_after_retries(
+    app, monkeypatch, products
+):
+    def failing_write(user_id, changes):
+        # Trips uq_cart_user_product, leaving the session needing a rollback
+        db.session.add_all(
+            [CartItem(user_id=user_id, product_id=1, quantity=1) for _ in range(2)]
+        )
+        db.session.flush()
+
+    store = MemoryCartStore(interval=60, retries=2)
+    store.add(101, 1, 1)
+    monkeypatch.setattr(cart_store, "write_cart_changes", failing_write)
+    store.add(101, 1, 2)
+
+    with pytest.raises(CartFlushError):
+        store.flush(101)
+    # Rolled back, so the session is usable and the changes are kept
+    assert [c.quantity for c in CartItem.query.all()] == [1]
+    assert store.pending() == 1
+
+    # flush() of every user logs the failure instead of raising
+    store.flush()
+    assert store.pending() == 0
+    assert store.stats()["dropped"] == 1
+    assert store.stats()["flushes"] == 1
+    assert [c.quantity for c in CartItem.query.all()] == [1]
+
+    monkeypatch.undo()
+    store.add(101, 2, 1)
+    store.flush()
+    rows = {(c.product_id, c.quantity) for c in CartItem.query.all()}
+    assert rows == {(1, 1), (2, 1)}
+
+
+def test_add_racing_checkout_is_flushed_as_increment(app, store, products):
+    store.add(101, 1, 2)
+
+    # Checkout flushes the cart, then an add lands before its transaction
+    # deletes the cart rows
+    store.flush(101)
+    store.add(101, 1, 1)
+    db.session.execute(delete(CartItem).where(CartItem.user_id == 101))
+    db.session.commit()
+
+    store.flush()
+    rows = [(c.product_id, c.quantity) for c in CartItem.query.all()]
+    assert rows == [(1, 1)]
+
+
+def test_set_and_remove_are_flushed_as_such(app, store, products):
+    store.add(101, 1, 2)
+    store.add(101, 2, 2)
+    store.apply(101, {1: ("set", 5), 2: ("remove", 0)})
+    store.add(101, 1, 1)
+
+    store.flush()
+    rows = [(c.product_id, c.quantity) for c in CartItem.query.all()]
+    assert rows == [(1, 6)]
@@ -216,3 +216,233 @@ def test_delete_cart_success_200(client):
     assert resp.status_code == 200
     items = resp.get_json()
     assert all(i["id"] != cart_id for i in items)
+
+
+# POST /api/cart - concurrent adds of the same product
+def test_concurrent_adds_same_product(tmp_path, monkeypatch):
+    import threading
+
+    from app import create_app
+    from extensions import db
+    from models import CartItem, Product
+
+    # A file database so every thread gets its own connection
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'cart.db'}")
+    app = create_app()
+    app.config.update(
+        TESTING=True,
+        JWT_SECRET_KEY="test-secret",
+        PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+    )
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Product(id=7, name="Hot Item", price=5, inventory=100))
+        db.session.commit()
+
+    headers = register_and_login(app.test_client())
+
+    threads_count = 8
+    adds_per_thread = 10
+    statuses = []
+    lock = threading.Lock()
+
+    def hammer():
+        client = app.test_client()
+        for _ in range(adds_per_thread):
+            resp = client.post(
+                "/api/cart", json={"product_id": 7, "quantity": 1}, headers=headers
+            )
+            with lock:
+                statuses.append(resp.status_code)
+
+    threads = [threading.Thread(target=hammer) for _ in range(threads_count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == [201] * (threads_count * adds_per_thread)
+
+    with app.app_context():
+        items = CartItem.query.filter_by(product_id=7).all()
+        assert len(items) == 1
+        assert items[0].quantity == threads_count * adds_per_thread
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_add_unavailable_product_400(client):
+    from extensions import db
+    from models import CartItem, Product
+
+    headers = register_and_login(client)
+    db.session.add(Product(id=8, name="Retired", price=5, available=False))
+    db.session.commit()
+
+    resp = client.post("/api/cart", json={"product_id": 8}, headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "product not available"
+    assert CartItem.query.count() == 0
+
+
+# PATCH /api/cart
+def seed_products(*ids, available=True):
+    from extensions import db
+    from models import Product
+
+    for pid in ids:
+        db.session.add(
+            Product(id=pid, name=f"Product {pid}", price=10, available=available)
+        )
+    db.session.commit()
+
+
+def test_patch_cart_applies_operations_in_one_commit(app, client):
+    from sqlalchemy import event
+    from extensions import db
+
+    headers = register_and_login(client)
+    seed_products(1, 2, 3)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 1}, headers=headers)
+    client.post("/api/cart", json={"product_id": 2, "quantity": 5}, headers=headers)
+
+    commits = []
+
+    def record(conn):
+        commits.append(1)
+
+    event.listen(db.engine, "commit", record)
+    try:
+        resp = client.patch(
+            "/api/cart",
+            json={
+                "operations": [
+                    {"op": "add", "product_id": 1, "quantity": 2},
+                    {"op": "remove", "product_id": 2},
+                    {"op": "set", "product_id": 3, "quantity": 4},
+                    {"op": "add", "product_id": 3, "quantity": 1},
+                ]
+            },
+            headers=headers,
+        )
+    finally:
+        event.remove(db.engine, "commit", record)
+
+    assert resp.status_code == 200
+    quantities = {item["product_id"]: item["quantity"] for item in resp.get_json()}
+    assert quantities == {1: 3, 3: 5}
+    assert len(commits) == 1
+
+    listed = client.get("/api/cart", headers=headers).get_json()
+    assert {item["product_id"]: item["quantity"] for item in listed} == quantities
+
+
+def test_patch_cart_remove_then_add_sets_quantity(client):
+    headers = register_and_login(client)
+    seed_products(1)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 7}, headers=headers)
+
+    resp = client.patch(
+        "/api/cart",
+        json={
+            "operations": [
+                {"op": "remove", "product_id": 1},
+                {"op": "add", "product_id": 1, "quantity": 2},
+            ]
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    assert [item["quantity"] for item in resp.get_json()] == [2]
+
+
+def test_patch_cart_validates_everything_before_writing(client):
+    headers = register_and_login(client)
+    seed_products(1)
+    seed_products(9, available=False)
+
+    resp = client.patch(
+        "/api/cart",
+        json={
+            "operations": [
+                {"op": "add", "product_id": 1, "quantity": 2},
+                {"op": "set", "product_id": 1, "quantity": 0},
+            ]
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "operations[1]: quantity must be > 0"
+
+    resp = client.patch(
+        "/api/cart",
+        json={
+            "operations": [
+                {"op": "add", "product_id": 1},
+                {"op": "add", "product_id": 9},
+                {"op": "add", "product_id": 404},
+            ]
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    assert resp.get_json()["product_ids"] == [9, 404]
+
+    resp = client.patch("/api/cart", json={"operations": []}, headers=headers)
+    assert resp.status_code == 400
+
+    # Nothing from the rejected batches was written
+    assert client.get("/api/cart", headers=headers).get_json() == []
+
+
+# GET /api/cart?expand=product
+def test_list_cart_expanded_with_totals(app, client):
+    from sqlalchemy import event
+    from extensions import db
+    from models import Product
+
+    headers = register_and_login(client)
+    db.session.add(Product(id=1, name="Mascara", price=9.99, image_url="m.webp"))
+    db.session.add(Product(id=2, name="Palette", price=19.5, image_url="p.webp"))
+    db.session.commit()
+    client.post("/api/cart", json={"product_id": 1, "quantity": 3}, headers=headers)
+    client.post("/api/cart", json={"product_id": 2, "quantity": 1}, headers=headers)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/api/cart?expand=product", headers=headers)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["subtotal"] == 49.47
+    assert data["item_count"] == 4
+
+    first, second = data["items"]
+    assert first["product_id"] == 1
+    assert first["product"] == {
+        "name": "Mascara",
+        "price": 9.99,
+        "image_url": "m.webp",
+        "available": True,
+    }
+    assert first["line_total"] == 29.97
+    assert second["line_total"] == 19.5
+
+    # One query for lines, products and totals
+    assert len(statements) == 1
+
+
+def test_list_cart_expanded_empty(client):
+    headers = register_and_login(client)
+
+    resp = client.get("/api/cart?expand=product", headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json() == {"items": [], "subtotal": 0.0, "item_count": 0}
@@ -0,0 +1,55 @@
+from catalog_cache import CatalogCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = CatalogCache(maxsize=2)
+    cache.set("a", b"1", cache.version)
+    cache.set("b", b"2", cache.version)
+
+    # Touch "a" so "b" becomes the eviction candidate
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3", cache.version)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bump_version_invalidates_entries():
+    cache = CatalogCache()
+    cache.set("a", b"1", cache.version)
+
+    cache.bump_version()
+
+    assert cache.get("a") is None
+
+
+def test_build_under_old_version_is_not_cached():
+    cache = CatalogCache()
+
+    def build():
+        # The catalog changes while this response is being built
+        cache.bump_version()
+        return b"stale"
+
+    assert cache.get_or_build("a", build) == b"stale"
+    assert cache.get("a") is None
+
+
+def test_get_or_build_counts_hits_and_misses():
+    cache = CatalogCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return b"body"
+
+    assert cache.get_or_build("a", build) == b"body"
+    assert cache.get_or_build("a", build) == b"body"
+    assert cache.get_or_build("missing", lambda: None) is None
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
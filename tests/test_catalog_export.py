@@ -0,0 +1,87 @@
+import gzip
+import json
+import stat
+
+import pytest
+
+import catalog_export
+from catalog_cache import catalog_cache
+from catalog_export import CatalogExporter
+from extensions import db
+from models import Product
+
+
+def add_products(count):
+    for i in range(count):
+        db.session.add(Product(name=f"Export {i}", price=i + 1, inventory=i))
+    db.session.commit()
+
+
+def test_export_writes_json_and_gzip(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_export, "EXPORT_BATCH_SIZE", 2)
+    add_products(5)
+    path = tmp_path / "campaign.json"
+
+    assert CatalogExporter(str(path)).export() is True
+
+    expected = [product.to_dict() for product in Product.query.order_by(Product.id)]
+    assert json.loads(path.read_text()) == expected
+    # Same layout as the old json.dump(..., indent=4)
+    assert path.read_text() == json.dumps(expected, indent=4)
+    gz_bytes = (tmp_path / "campaign.json.gz").read_bytes()
+    assert json.loads(gzip.decompress(gz_bytes)) == expected
+
+    # Only the two final files are left behind
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ["campaign.json", "campaign.json.gz"]
+
+
+def test_export_of_empty_catalog(app, tmp_path):
+    path = tmp_path / "campaign.json"
+
+    CatalogExporter(str(path)).export()
+
+    assert json.loads(path.read_text()) == []
+
+
+def test_export_skips_until_catalog_version_changes(app, tmp_path):
+    exporter = CatalogExporter(str(tmp_path / "campaign.json"))
+
+    assert exporter.export() is True
+    assert exporter.export() is False
+
+    catalog_cache.bump_version()
+    assert exporter.export() is True
+    assert exporter.export(force=True) is True
+
+
+def test_failed_export_keeps_previous_file(app, tmp_path, monkeypatch):
+    path = tmp_path / "campaign.json"
+    path.write_text("previous")
+
+    def broken_chunks():
+        yield b"[\n"
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(catalog_export, "_export_chunks", broken_chunks)
+
+    with pytest.raises(RuntimeError):
+        CatalogExporter(str(path)).export()
+
+    assert path.read_text() == "previous"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["campaign.json"]
+
+
+def test_export_keeps_readable_permissions(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_export, "_UMASK", 0o022)
+    path = tmp_path / "campaign.json"
+
+    CatalogExporter(str(path)).export()
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+    gz_path = tmp_path / "campaign.json.gz"
+    assert stat.S_IMODE(gz_path.stat().st_mode) == 0o644
+
+    # A replaced file keeps the mode it had
+    path.chmod(0o640)
+    CatalogExporter(str(path)).export()
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
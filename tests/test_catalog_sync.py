@@ -0,0 +1,257 @@
+import threading
+from uuid import uuid4
+
+import catalog_sync
+from catalog_sync import CatalogSyncer
+from extensions import db
+from models import Product
+
+
+# -------------------------------------------------
+# Helper: register + login to get JWT headers
+# -------------------------------------------------
+def register_and_login(client):
+    email = f"user_{uuid4().hex}@example.com"
+    password = "Password123!"
+
+    resp = client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "phone_number": "1234567890",
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Billy",
+        },
+    )
+    assert resp.status_code == 201
+
+    resp = client.post(
+        "/auth/login",
+        json={"email": email, "password": password},
+    )
+    assert resp.status_code == 200
+
+    token = resp.get_json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, products=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._products = products or []
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def json(self):
+        return {"products": self._products}
+
+
+REMOTE_PRODUCTS = [
+    {
+        "id": 1,
+        "title": "Essence Mascara Lash Princess",
+        "price": 9.99,
+        "thumbnail": "https://cdn.dummyjson.com/mascara.webp",
+        "description": "Popular mascara",
+        "category": "beauty",
+        "stock": 5,
+    },
+    {
+        "id": 2,
+        "title": "Eyeshadow Palette with Mirror",
+        "price": 19.99,
+        "thumbnail": "https://cdn.dummyjson.com/palette.webp",
+        "description": "Versatile palette",
+        "category": "beauty",
+        "stock": 44,
+    },
+]
+
+
+# -------------------------------------------------
+# fetchApiProducts
+# -------------------------------------------------
+def test_fetch_sends_validators_and_handles_304(app, monkeypatch):
+    seen_headers = {}
+
+    def fake_get(url, headers=None, timeout=None):
+        seen_headers.update(headers or {})
+        return FakeResponse(status_code=304)
+
+    monkeypatch.setattr(catalog_sync.requests, "get", fake_get)
+
+    result = catalog_sync.fetchApiProducts('"abc"', "Tue, 01 Jan 2030 00:00:00 GMT")
+
+    assert result["status"] == "not_modified"
+    assert result["etag"] == '"abc"'
+    assert seen_headers["If-None-Match"] == '"abc"'
+    assert seen_headers["If-Modified-Since"] == "Tue, 01 Jan 2030 00:00:00 GMT"
+    assert Product.query.count() == 0
+
+
+def test_syncer_stores_validators_and_last_sync(app, monkeypatch):
+    def fake_get(url, headers=None, timeout=None):
+        return FakeResponse(
+            products=REMOTE_PRODUCTS,
+            headers={"ETag": '"v1"', "Last-Modified": "Wed, 02 Jan 2030 00:00:00 GMT"},
+        )
+
+    monkeypatch.setattr(catalog_sync.requests, "get", fake_get)
+
+    syncer = CatalogSyncer()
+    result = syncer.run_once()
+
+    assert result["status"] == "synced"
+    assert syncer.etag == '"v1"'
+    assert syncer.last_modified == "Wed, 02 Jan 2030 00:00:00 GMT"
+    assert syncer.last_sync_at is not None
+    assert Product.query.count() == 2
+
+
+def test_syncer_is_single_flight(app, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(etag=None, last_modified=None):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": "not_modified", "etag": etag, "last_modified": last_modified}
+
+    monkeypatch.setattr(catalog_sync, "fetchApiProducts", slow_fetch)
+
+    syncer = CatalogSyncer()
+    worker = threading.Thread(target=syncer.run_once)
+    worker.start()
+    assert started.wait(5)
+
+    # A second trigger while the first is still running is rejected
+    assert syncer.run_once() == {"status": "in_progress"}
+
+    release.set()
+    worker.join()
+    assert len(calls) == 1
+
+
+# -------------------------------------------------
+# /api/products/sync
+# -------------------------------------------------
+def test_sync_endpoint_requires_jwt(client):
+    resp = client.post("/api/products/sync")
+    assert resp.status_code == 401
+
+
+def test_sync_endpoint_runs_sync(client, monkeypatch):
+    headers = register_and_login(client)
+
+    monkeypatch.setattr(
+        catalog_sync,
+        "fetchApiProducts",
+        lambda etag=None, last_modified=None: {"status": "synced"},
+    )
+
+    resp = client.post("/api/products/sync", headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["last_sync_at"] is not None
+
+    resp = client.get("/api/products/sync")
+    assert resp.status_code == 200
+    assert resp.get_json()["last_result"] == {"status": "synced"}
+
+
+# -------------------------------------------------
+# upsert_products
+# -------------------------------------------------
+def test_upsert_reports_insert_update_unchanged_counts(app):
+    counts = catalog_sync.upsert_products(REMOTE_PRODUCTS)
+    assert counts == {"inserted": 2, "updated": 0, "unchanged": 0}
+
+    # New rows keep their DummyJSON ids
+    assert Product.query.get(1).name == "Essence Mascara Lash Princess"
+    assert Product.query.get(1).category == "beauty"
+    assert Product.query.get(2).name == "Eyeshadow Palette with Mirror"
+
+    first_synced_at = Product.query.get(1).updated_at
+
+    changed = [dict(REMOTE_PRODUCTS[0], price=7.5), REMOTE_PRODUCTS[1]]
+    counts = catalog_sync.upsert_products(changed)
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 1}
+
+    db.session.expire_all()
+    product = Product.query.filter_by(name="Essence Mascara Lash Princess").first()
+    assert float(product.price) == 7.5
+    assert product.updated_at > first_synced_at
+    assert Product.query.count() == 2
+
+
+def test_upsert_does_not_reuse_taken_ids(app):
+    db.session.add(Product(id=1, name="Local Product", price=1, inventory=0))
+    db.session.commit()
+
+    counts = catalog_sync.upsert_products(REMOTE_PRODUCTS)
+    assert counts["inserted"] == 2
+
+    assert Product.query.get(1).name == "Local Product"
+    mascara = Product.query.filter_by(name="Essence Mascara Lash Princess").first()
+    assert mascara.id not in (1, 2)
+
+
+def test_upsert_keeps_local_inventory(app):
+    from inventory import reserve_stock
+
+    catalog_sync.upsert_products(REMOTE_PRODUCTS)
+    assert Product.query.get(1).inventory == 5
+
+    # Stock reserved by a checkout must survive the next sync
+    reserve_stock({1: 3})
+    db.session.commit()
+
+    changed = [dict(REMOTE_PRODUCTS[0], price=7.5, stock=50), REMOTE_PRODUCTS[1]]
+    counts = catalog_sync.upsert_products(changed)
+    assert counts == {"inserted": 0, "updated": 1, "unchanged": 1}
+
+    db.session.expire_all()
+    product = Product.query.get(1)
+    assert float(product.price) == 7.5
+    assert product.inventory == 2
+
+
+def test_upsert_replaces_placeholder_from_add_to_cart(client):
+    headers = register_and_login(client)
+
+    # Unknown product added to a cart with client-supplied data
+    resp = client.post(
+        "/api/cart",
+        json={
+            "product_id": 1,
+            "name": "Essence Mascara Lash Princess",
+            "price": 0.01,
+            "inventory": 1000,
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 201
+    product = Product.query.get(1)
+    assert product.placeholder and product.inventory == 0
+
+    # Nothing the client sent can be bought before the sync
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 409
+
+    counts = catalog_sync.upsert_products(REMOTE_PRODUCTS)
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 0}
+
+    db.session.expire_all()
+    product = Product.query.get(1)
+    assert not product.placeholder
+    assert float(product.price) == 9.99
+    assert product.inventory == 5
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 201
+    assert resp.get_json()["total_price"] == "9.99"
@@ -0,0 +1,375 @@
+import threading
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import update
+
+from extensions import db
+from inventory import (
+    OutOfStock,
+    mark_paid,
+    refresh_sharded_inventory,
+    release_expired,
+    release_order,
+    reserve_stock,
+    shard_product,
+    short_products,
+    unshard_product,
+)
+from models import CartItem, InventorySlot, Order, OrderItem, Product
+
+
+def register_and_login(client):
+    email = f"user_{uuid4().hex}@example.com"
+    password = "Password123!"
+
+    resp = client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "phone_number": "1234567890",
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Billy",
+        },
+    )
+    assert resp.status_code == 201
+
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).inventory
+
+
+@pytest.fixture()
+def products(app):
+    db.session.add(Product(id=1, name="Lipstick", price=5, inventory=3))
+    db.session.add(Product(id=2, name="Blush", price=8, inventory=1))
+    db.session.commit()
+
+
+def test_reserve_stock_is_all_or_nothing(app, products):
+    reserve_stock({1: 2, 2: 1})
+    db.session.commit()
+    assert (stock(1), stock(2)) == (1, 0)
+
+    with pytest.raises(OutOfStock):
+        reserve_stock({1: 1, 2: 1})
+    db.session.rollback()
+
+    assert (stock(1), stock(2)) == (1, 0)
+    assert short_products({1: 1, 2: 1}) == [2]
+
+
+def test_order_reserves_and_cancel_releases(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 201
+    order = resp.get_json()
+    assert order["reserved_until"] is not None
+    assert stock(1) == 1
+
+    resp = client.delete(f"/api/orders/{order['id']}", headers=headers)
+    assert resp.status_code == 200
+    assert stock(1) == 3
+
+
+def test_order_beyond_stock_409_keeps_cart(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 1}, headers=headers)
+    client.post("/api/cart", json={"product_id": 2, "quantity": 2}, headers=headers)
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 409
+    assert resp.get_json() == {"error": "insufficient stock", "product_ids": [2]}
+
+    assert (stock(1), stock(2)) == (3, 1)
+    assert Order.query.count() == 0
+    assert len(client.get("/api/cart", headers=headers).get_json()) == 2
+
+
+def test_paid_order_keeps_stock(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 2, "quantity": 1}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+
+    resp = client.put(f"/api/orders/{order_id}/pay", headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["reserved_until"] is None
+
+    assert release_expired(datetime.utcnow() + timedelta(days=1)) == 0
+    assert stock(2) == 0
+
+
+def test_expired_reservations_are_released(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 3}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+    assert stock(1) == 0
+
+    assert release_expired() == 0
+    assert release_expired(datetime.utcnow() + timedelta(days=1)) == 1
+    assert stock(1) == 3
+    assert db.session.get(Order, order_id).payment_status == "expired"
+
+    # Releasing twice must not add the stock back twice
+    assert release_expired(datetime.utcnow() + timedelta(days=1)) == 0
+    assert stock(1) == 3
+
+    resp = client.put(f"/api/orders/{order_id}/pay", headers=headers)
+    assert resp.status_code == 409
+    assert db.session.get(Order, order_id).payment_status == "expired"
+
+
+def test_failed_order_cannot_be_paid(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+
+    # What checkout does when Stripe fails: stock goes back, order "failed"
+    release_order(order_id)
+    db.session.get(Order, order_id).payment_status = "failed"
+    db.session.commit()
+    assert stock(1) == 3
+
+    resp = client.put(f"/api/orders/{order_id}/pay", headers=headers)
+    assert resp.status_code == 409
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).payment_status == "failed"
+
+
+def test_pay_wins_race_with_sweeper(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+
+    resp = client.put(f"/api/orders/{order_id}/pay", headers=headers)
+    assert resp.status_code == 200
+
+    # A sweep that selected the order before it was paid can't release it
+    assert release_order(order_id) is False
+    db.session.commit()
+    assert stock(1) == 1
+    assert db.session.get(Order, order_id).payment_status == "paid"
+
+
+def test_sweeper_wins_race_with_pay(client, products):
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+
+    # The sweep claimed the reservation, but hasn't marked the order yet
+    assert release_order(order_id) is True
+    db.session.commit()
+
+    resp = client.put(f"/api/orders/{order_id}/pay", headers=headers)
+    assert resp.status_code == 409
+    assert stock(1) == 3
+
+
+def slot_quantities(product_id):
+    db.session.expire_all()
+    slots = InventorySlot.query.filter_by(product_id=product_id)
+    return [s.quantity for s in slots.order_by(InventorySlot.slot)]
+
+
+def test_shard_product_splits_stock_evenly(app):
+    product = Product(id=5, name="Flash Sale", price=1, inventory=10)
+    db.session.add(product)
+    db.session.commit()
+
+    shard_product(product, 4)
+    db.session.commit()
+
+    assert slot_quantities(5) == [3, 3, 2, 2]
+    assert product.sharded and product.inventory == 10
+
+    unshard_product(product)
+    db.session.commit()
+    assert slot_quantities(5) == []
+    assert not product.sharded and product.inventory == 10
+
+
+def test_sharded_reserve_takes_from_slots(app):
+    product = Product(id=5, name="Flash Sale", price=1, inventory=4)
+    db.session.add(product)
+    shard_product(product, 4)
+    db.session.commit()
+
+    # Every slot holds 1, so 3 units have to come from several slots
+    assert reserve_stock({5: 3}) is False
+    db.session.commit()
+    assert sum(slot_quantities(5)) == 1
+
+    # products.inventory is the cached total until the next refresh
+    assert stock(5) == 4
+    assert refresh_sharded_inventory() == 1
+    assert stock(5) == 1
+
+    with pytest.raises(OutOfStock):
+        reserve_stock({5: 2})
+    db.session.rollback()
+    assert short_products({5: 2}) == [5]
+    assert sum(slot_quantities(5)) == 1
+
+
+def test_sharded_order_and_cancel(client):
+    headers = register_and_login(client)
+    product = Product(id=5, name="Flash Sale", price=1, inventory=8)
+    db.session.add(product)
+    shard_product(product, 4)
+    db.session.commit()
+
+    client.post("/api/cart", json={"product_id": 5, "quantity": 2}, headers=headers)
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 201
+    assert sum(slot_quantities(5)) == 6
+
+    resp = client.delete(f"/api/orders/{resp.get_json()['id']}", headers=headers)
+    assert resp.status_code == 200
+    assert sum(slot_quantities(5)) == 8
+
+
+def test_update_sharded_product_inventory_respreads(client):
+    headers = register_and_login(client)
+    product = Product(id=5, name="Flash Sale", price=1, inventory=8)
+    db.session.add(product)
+    shard_product(product, 2)
+    db.session.commit()
+
+    resp = client.put("/api/products/5", json={"inventory": 11}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["inventory"] == 11
+    assert slot_quantities(5) == [6, 5]
+
+
+@pytest.mark.parametrize("slots", ["0", "-2"])
+def test_shard_inventory_command_rejects_bad_slot_counts(app, products, slots):
+    result = app.test_cli_runner().invoke(
+        args=["shard-inventory", "1", "--slots", slots]
+    )
+    assert result.exit_code == 2
+    assert "--slots" in result.output
+    assert slot_quantities(1) == []
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_concurrent_reservations_never_oversell(tmp_path, monkeypatch, sharded):
+    from app import create_app
+
+    # A file database so every thread gets its own connection
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'stock.db'}")
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        product = Product(id=9, name="Hot Item", price=5, inventory=25)
+        db.session.add(product)
+        if sharded:
+            shard_product(product, 4)
+        db.session.commit()
+
+    results = []
+    lock = threading.Lock()
+
+    def buy():
+        with app.app_context():
+            for _ in range(10):
+                try:
+                    reserve_stock({9: 1})
+                    db.session.commit()
+                    ok = True
+                except OutOfStock:
+                    db.session.rollback()
+                    ok = False
+                with lock:
+                    results.append(ok)
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results.count(True) == 25
+    with app.app_context():
+        refresh_sharded_inventory()
+        assert db.session.get(Product, 9).inventory == 0
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize("paid_at", ["before_claim", "after_claim"])
+def test_cancel_racing_pay_keeps_paid_order(client, products, monkeypatch, paid_at):
+    import orders
+
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+    order_id = client.post("/api/orders/from-cart", headers=headers).get_json()["id"]
+
+    real_release_order = orders.release_order
+
+    def release_while_paying(order_id):
+        # /pay lands after cancel has read the order as pending
+        if paid_at == "before_claim":
+            mark_paid(order_id)
+        released = real_release_order(order_id)
+        if paid_at == "after_claim":
+            db.session.execute(
+                update(Order.__table__)
+                .where(Order.id == order_id)
+                .values(payment_status="paid")
+            )
+        return released
+
+    monkeypatch.setattr(orders, "release_order", release_while_paying)
+
+    resp = client.delete(f"/api/orders/{order_id}", headers=headers)
+    assert resp.status_code == 409
+
+    db.session.expire_all()
+    assert db.session.get(Order, order_id) is not None
+    assert OrderItem.query.filter_by(order_id=order_id).count() == 1
+    assert stock(1) == 1
+
+
+def test_order_items_match_reserved_cart(client, products, monkeypatch):
+    import orders
+
+    headers = register_and_login(client)
+    client.post("/api/cart", json={"product_id": 1, "quantity": 2}, headers=headers)
+    user_id = CartItem.query.one().user_id
+
+    real_reserve_stock = orders.reserve_stock
+
+    def reserve_then_cart_changes(lines):
+        changed = real_reserve_stock(lines)
+        # Another request edits the cart between the reservation and the copy
+        db.session.execute(
+            update(CartItem.__table__)
+            .where(CartItem.user_id == user_id)
+            .values(quantity=3)
+        )
+        db.session.add(CartItem(user_id=user_id, product_id=2, quantity=1))
+        db.session.flush()
+        return changed
+
+    monkeypatch.setattr(orders, "reserve_stock", reserve_then_cart_changes)
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 201
+    order = resp.get_json()
+
+    items = OrderItem.query.filter_by(order_id=order["id"]).all()
+    assert [(i.product_id, i.quantity) for i in items] == [(1, 2)]
+    assert order["total_price"] == "10.00"
+    assert (stock(1), stock(2)) == (1, 1)
+    # The line added mid-checkout wasn't ordered, so it stays in the cart
+    assert [(c.product_id, c.quantity) for c in CartItem.query.all()] == [(2, 1)]
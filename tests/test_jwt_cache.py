@@ -0,0 +1,138 @@
+from uuid import uuid4
+
+from flask_jwt_extended import JWTManager
+
+from extensions import jwt
+
+
+def login(client):
+    email = f"user_{uuid4().hex}@example.com"
+    password = "Password123!"
+    client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Billy",
+        },
+    )
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    return resp.get_json()
+
+
+def count_signature_checks(monkeypatch):
+    calls = []
+    original = JWTManager._decode_jwt_from_config
+
+    def counting(self, *args, **kwargs):
+        calls.append(1)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(JWTManager, "_decode_jwt_from_config", counting)
+    return calls
+
+
+def test_decode_cache_is_off_by_default(client, monkeypatch):
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    calls = count_signature_checks(monkeypatch)
+
+    for _ in range(3):
+        assert client.get("/api/cart", headers=headers).status_code == 200
+
+    assert len(calls) == 3
+    assert jwt.decode_cache_stats()["hits"] == 0
+
+
+def test_decode_cache_skips_repeat_verification(client, monkeypatch):
+    monkeypatch.setattr(jwt, "decode_cache_size", 100)
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    calls = count_signature_checks(monkeypatch)
+
+    for _ in range(5):
+        assert client.get("/api/cart", headers=headers).status_code == 200
+
+    assert len(calls) == 1
+    stats = client.get("/api/metrics").get_json()["jwt_decode_cache"]
+    assert stats["hits"] == 4
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.8
+
+
+def test_decode_cache_still_honours_revocation(client, monkeypatch):
+    monkeypatch.setattr(jwt, "decode_cache_size", 100)
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    assert client.get("/api/cart", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/cart", headers=headers).status_code == 401
+
+
+def test_decode_cache_does_not_serve_expired_tokens(client, monkeypatch):
+    import jwt_cache
+
+    monkeypatch.setattr(jwt, "decode_cache_size", 100)
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/cart", headers=headers).status_code == 200
+
+    # Jump past the token's expiry: the cached claims must not be used
+    real_time = jwt_cache.time.time
+    monkeypatch.setattr(jwt_cache.time, "time", lambda: real_time() + 3600)
+    calls = count_signature_checks(monkeypatch)
+
+    client.get("/api/cart", headers=headers)
+    assert len(calls) == 1
+
+
+def test_decode_cache_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(jwt, "decode_cache_size", 2)
+
+    for _ in range(3):
+        tokens = login(client)
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        assert client.get("/api/cart", headers=headers).status_code == 200
+
+    assert jwt.decode_cache_stats()["size"] == 2
+
+
+def test_installed_jwt_extended_has_the_cached_hook():
+    import jwt_cache
+
+    assert jwt_cache.decode_hook_compatible()
+
+
+def test_decode_cache_is_off_with_decode_key_loader(app, client, monkeypatch):
+    monkeypatch.setattr(jwt, "decode_cache_size", 100)
+    # Per-token keys can't be part of the cache key, so the cache stays off
+    monkeypatch.setattr(
+        jwt, "_decode_key_callback", lambda header, claims: app.config["JWT_SECRET_KEY"]
+    )
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    calls = count_signature_checks(monkeypatch)
+
+    for _ in range(3):
+        assert client.get("/api/cart", headers=headers).status_code == 200
+
+    assert len(calls) == 3
+    assert jwt.decode_cache_stats()["enabled"] is False
+    assert jwt.decode_cache_stats()["hits"] == 0
+
+
+def test_decode_cache_is_off_for_incompatible_hook(client, monkeypatch):
+    import jwt_cache
+
+    monkeypatch.setattr(jwt, "decode_cache_size", 100)
+    monkeypatch.setattr(jwt_cache, "DECODE_HOOK_COMPATIBLE", False)
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    calls = count_signature_checks(monkeypatch)
+
+    for _ in range(3):
+        assert client.get("/api/cart", headers=headers).status_code == 200
+
+    assert len(calls) == 3
@@ -0,0 +1,34 @@
+from lru import LRUCache
+
+
+def test_invalid_entries_count_as_misses():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+
+    assert cache.get("a", valid=lambda value: value > 1) is None
+    assert cache.get("a") == 1
+    assert cache.get("b", default=0) == 0
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_zero_maxsize_keeps_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+
+    assert len(cache) == 0
+    assert cache.stats()["evictions"] == 0
+
+
+def test_clear_keeps_counters_and_reset_zeroes_them():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.get("a")
+
+    cache.clear()
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hits"] == 1
+
+    cache.reset()
+    assert cache.stats()["hits"] == 0
@@ -1,5 +1,5 @@
 from uuid import uuid4
-import products  # products.py module
+import catalog_sync  # catalog_sync.py module
 
 
 # -------------------------------------------------
@@ -39,9 +39,13 @@ def register_and_login(client):
 def test_list_products_returns_list(client, monkeypatch):
     """
     GET /api/products should return a JSON list.
-    We monkeypatch fetchApiProducts to avoid real DummyJSON HTTP calls.
+    The DummyJSON sync runs in the background, so the list endpoint
+    must never call fetchApiProducts.
     """
-    monkeypatch.setattr(products, "fetchApiProducts", lambda: None)
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("list_products must not call DummyJSON")
+
+    monkeypatch.setattr(catalog_sync, "fetchApiProducts", fail_if_called)
 
     resp = client.get("/api/products")
     assert resp.status_code == 200
@@ -318,3 +322,87 @@ def test_delete_product_success_returns_200(client):
     resp = client.get(f"/api/products/{product_id}", headers=headers)
     assert resp.status_code == 404
     assert resp.get_json()["error"] == "product not found"
+
+
+# -------------------------------------------------
+# POST /api/orders/from-cart  (create from cart)
+# -------------------------------------------------
+
+
+def seed_cart(client, headers, count):
+    from extensions import db
+    from models import Product
+
+    for pid in range(1, count + 1):
+        db.session.add(Product(id=pid, name=f"Product {pid}", price=2.5, inventory=5))
+    db.session.commit()
+
+    operations = [
+        {"op": "add", "product_id": pid, "quantity": 2}
+        for pid in range(1, count + 1)
+    ]
+    resp = client.patch("/api/cart", json={"operations": operations}, headers=headers)
+    assert resp.status_code == 200
+
+
+def test_create_order_from_cart_one_transaction(client):
+    from sqlalchemy import event
+    from extensions import db
+    from models import CartItem, OrderItem
+
+    headers = register_and_login(client)
+    seed_cart(client, headers, 20)
+
+    statements = []
+    commits = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def record_commit(conn):
+        commits.append(conn)
+
+    event.listen(db.engine, "before_cursor_execute", record_statement)
+    event.listen(db.engine, "commit", record_commit)
+    try:
+        resp = client.post("/api/orders/from-cart", headers=headers)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record_statement)
+        event.remove(db.engine, "commit", record_commit)
+
+    assert resp.status_code == 201
+    order = resp.get_json()
+    assert order["total_price"] == "100.00"
+
+    # Same statements for 20 lines as for 1: no per-line product loads
+    assert len(statements) <= 8
+    assert len(commits) == 1
+
+    items = OrderItem.query.filter_by(order_id=order["id"]).all()
+    assert len(items) == 20
+    assert all(i.quantity == 2 and float(i.price) == 2.5 for i in items)
+    assert CartItem.query.count() == 0
+
+
+def test_create_order_from_empty_cart_400(client):
+    headers = register_and_login(client)
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "cart is empty"
+
+
+def test_create_order_with_unavailable_product_writes_nothing(client):
+    from extensions import db
+    from models import CartItem, Order, Product
+
+    headers = register_and_login(client)
+    seed_cart(client, headers, 3)
+    db.session.get(Product, 2).available = False
+    db.session.commit()
+
+    resp = client.post("/api/orders/from-cart", headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "product 2 not available"
+    assert Order.query.count() == 0
+    assert CartItem.query.count() == 3
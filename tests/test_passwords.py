@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+import passwords
+from extensions import db
+from models import User
+from passwords import PasswordHasher, PasswordHasherBusy, needs_rehash
+
+
+def register(client, email, password="Password123!"):
+    resp = client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Fluffy",
+        },
+    )
+    assert resp.status_code == 201
+
+
+def test_hash_method_is_configurable(app):
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+
+    user = User(email="cheap@example.com")
+    user.set_password("secret")
+
+    assert user.password_hash.startswith("pbkdf2:sha256:1000$")
+    assert user.check_password("secret")
+    assert not user.check_password("wrong")
+    assert not needs_rehash(user.password_hash)
+
+
+def test_login_rehashes_outdated_hash(app, client):
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+    register(client, "upgrade@example.com")
+
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+    resp = client.post(
+        "/auth/login", json={"email": "upgrade@example.com", "password": "Password123!"}
+    )
+    assert resp.status_code == 200
+
+    db.session.expire_all()
+    user = User.query.filter_by(email="upgrade@example.com").first()
+    assert user.password_hash.startswith("pbkdf2:sha256:2000$")
+
+    # The upgraded hash still verifies
+    resp = client.post(
+        "/auth/login", json={"email": "upgrade@example.com", "password": "Password123!"}
+    )
+    assert resp.status_code == 200
+
+
+def test_hasher_rejects_work_beyond_queue_limit():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(hasher.run(slow)))
+    worker.start()
+    assert started.wait(5)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.run(lambda: "never")
+
+    release.set()
+    worker.join()
+    assert results == ["done"]
+    assert hasher.stats()["rejected"] == 1
+
+    # Capacity is released once the running hash finishes
+    assert hasher.run(lambda: "ok") == "ok"
+
+
+def test_login_returns_503_when_hasher_is_saturated(client, monkeypatch):
+    register(client, "busy@example.com")
+
+    def busy(fn, *args):
+        raise PasswordHasherBusy()
+
+    monkeypatch.setattr(passwords.password_hasher, "run", busy)
+
+    resp = client.post(
+        "/auth/login", json={"email": "busy@example.com", "password": "Password123!"}
+    )
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
@@ -178,3 +178,143 @@ def test_checkout_stripe_error_returns_500(client, monkeypatch):
     data = resp.get_json()
     assert "error" in data
     assert "Stripe error:" in data["error"]
+
+
+def test_checkout_reserves_stock_and_releases_on_stripe_error(client, monkeypatch):
+    from extensions import db
+    from models import Order, Product
+
+    headers = register_and_login(client)
+    db.session.add(Product(id=50, name="Serum", price=12, inventory=3))
+    db.session.commit()
+
+    client.post("/api/cart", json={"product_id": 50, "quantity": 5}, headers=headers)
+    resp = client.post("/payments/checkout", headers=headers)
+    assert resp.status_code == 409
+    assert resp.get_json()["product_ids"] == [50]
+
+    cart_id = client.get("/api/cart", headers=headers).get_json()[0]["id"]
+    client.put(f"/api/cart/{cart_id}", json={"quantity": 3}, headers=headers)
+
+    def fake_create(**kwargs):
+        # Stock is already held while Stripe is called
+        assert db.session.get(Product, 50).inventory == 0
+        raise Exception("card network down")
+
+    monkeypatch.setattr(stripe.checkout.Session, "create", fake_create)
+
+    resp = client.post("/payments/checkout", headers=headers)
+    assert resp.status_code == 500
+
+    db.session.expire_all()
+    assert db.session.get(Product, 50).inventory == 3
+    order = Order.query.filter_by(payment_status="failed").one()
+    assert order.reserved_until is None
+
+
+def checkout_one_item(client, monkeypatch, headers):
+    """Check out 2 of a 5-in-stock product; returns (order_id, product_id)."""
+    from extensions import db
+    from models import Product
+
+    db.session.add(Product(id=60, name="Toner", price=7, inventory=5))
+    db.session.commit()
+    client.post("/api/cart", json={"product_id": 60, "quantity": 2}, headers=headers)
+
+    created = {}
+
+    def fake_create(**kwargs):
+        created.update(kwargs)
+        return type("DummySession", (), {"url": "https://example.com/pay"})()
+
+    monkeypatch.setattr(stripe.checkout.Session, "create", fake_create)
+    resp = client.post("/payments/checkout", headers=headers)
+    assert resp.status_code == 200
+    assert "session_id={CHECKOUT_SESSION_ID}" in created["success_url"]
+    return resp.get_json()["order_id"], 60
+
+
+def paid_session(order_id, payment_status="paid"):
+    return {
+        "id": "cs_test_1",
+        "payment_status": payment_status,
+        "metadata": {"order_id": str(order_id)},
+    }
+
+
+def test_success_page_confirms_payment_before_sweep(client, monkeypatch):
+    from datetime import datetime, timedelta
+
+    from extensions import db
+    from inventory import release_expired
+    from models import Order, Product
+
+    headers = register_and_login(client)
+    order_id, product_id = checkout_one_item(client, monkeypatch, headers)
+    monkeypatch.setattr(
+        stripe.checkout.Session,
+        "retrieve",
+        lambda session_id: paid_session(order_id),
+    )
+
+    resp = client.get(f"/order/confirmed?order_id={order_id}&session_id=cs_test_1")
+    assert resp.status_code == 200
+
+    # The sweeper must leave a paid order and its sold stock alone
+    assert release_expired(datetime.utcnow() + timedelta(days=1)) == 0
+    db.session.expire_all()
+    order = db.session.get(Order, order_id)
+    assert order.payment_status == "paid"
+    assert order.reserved_until is None
+    assert db.session.get(Product, product_id).inventory == 3
+
+
+def test_success_page_ignores_unpaid_session(client, monkeypatch):
+    from extensions import db
+    from models import Order
+
+    headers = register_and_login(client)
+    order_id, _ = checkout_one_item(client, monkeypatch, headers)
+    monkeypatch.setattr(
+        stripe.checkout.Session,
+        "retrieve",
+        lambda session_id: paid_session(order_id, payment_status="unpaid"),
+    )
+
+    client.get(f"/order/confirmed?order_id={order_id}&session_id=cs_test_1")
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).payment_status == "pending"
+
+
+def test_webhook_confirms_completed_session(client, monkeypatch):
+    import payment
+    from extensions import db
+    from models import Order
+
+    headers = register_and_login(client)
+    order_id, _ = checkout_one_item(client, monkeypatch, headers)
+
+    assert client.post("/payments/webhook", data="{}").status_code == 404
+
+    monkeypatch.setattr(payment, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    resp = client.post(
+        "/payments/webhook", data="{}", headers={"Stripe-Signature": "t=1,v1=bad"}
+    )
+    assert resp.status_code == 400
+
+    def fake_construct_event(payload, signature, secret):
+        return {
+            "type": "checkout.session.completed",
+            "data": {"object": paid_session(order_id)},
+        }
+
+    monkeypatch.setattr(stripe.Webhook, "construct_event", fake_construct_event)
+    resp = client.post("/payments/webhook", data="{}")
+    assert resp.status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).payment_status == "paid"
+
+    # A redelivered event finds nothing left to claim
+    assert client.post("/payments/webhook", data="{}").status_code == 200
+    assert db.session.get(Order, order_id).payment_status == "paid"
@@ -1,5 +1,12 @@
+import json
 from uuid import uuid4
+from sqlalchemy import event
+
+import catalog_sync
 import products
+from extensions import db
+from inventory import shard_product, stock_level
+from models import Product
 
 
 # ---------------------------
@@ -38,10 +45,13 @@ def register_and_login(client):
 # -------------------------------------------------
 def test_list_products_returns_list(client, monkeypatch):
     """
-    Should return a list. Must monkeypatch fetchApiProducts()
-    to prevent real DummyJSON API calls.
+    Should return a list from local data only. The DummyJSON sync
+    runs in the background, so fetchApiProducts() must not be called.
     """
-    monkeypatch.setattr(products, "fetchApiProducts", lambda: None)
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("list_products must not call DummyJSON")
+
+    monkeypatch.setattr(catalog_sync, "fetchApiProducts", fail_if_called)
 
     resp = client.get("/api/products")
     assert resp.status_code == 200
@@ -284,3 +294,467 @@ def test_delete_product_success_returns_200(client):
     resp = client.get(f"/api/products/{product_id}", headers=headers)
     assert resp.status_code == 404
     assert resp.get_json()["error"] == "product not found"
+
+
+# -------------------------------------------------
+# GET /api/products  (keyset pagination + filters)
+# -------------------------------------------------
+def create_products(client, headers, rows):
+    ids = []
+    for row in rows:
+        resp = client.post("/api/products", json=row, headers=headers)
+        assert resp.status_code == 201
+        ids.append(resp.get_json()["id"])
+    return ids
+
+
+def test_list_products_paginates_with_cursor(client):
+    headers = register_and_login(client)
+    ids = create_products(
+        client,
+        headers,
+        [{"name": f"Item {i}", "price": i, "inventory": i} for i in range(1, 6)],
+    )
+
+    resp = client.get("/api/products?limit=2")
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.get_json()] == ids[:2]
+    cursor = resp.headers["X-Next-Cursor"]
+    assert 'rel="next"' in resp.headers["Link"]
+
+    resp = client.get(f"/api/products?limit=2&cursor={cursor}")
+    assert [p["id"] for p in resp.get_json()] == ids[2:4]
+    cursor = resp.headers["X-Next-Cursor"]
+
+    # Last page carries no cursor
+    resp = client.get(f"/api/products?limit=2&cursor={cursor}")
+    assert [p["id"] for p in resp.get_json()] == ids[4:]
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_list_products_filters(client):
+    headers = register_and_login(client)
+    create_products(
+        client,
+        headers,
+        [
+            {"name": "Cheap", "price": 2, "inventory": 0},
+            {"name": "Mid", "price": 20, "inventory": 3},
+            {"name": "Pricey", "price": 200, "inventory": 1, "available": False},
+        ],
+    )
+
+    resp = client.get("/api/products?min_price=10&max_price=100")
+    assert [p["name"] for p in resp.get_json()] == ["Mid"]
+
+    resp = client.get("/api/products?in_stock=true")
+    assert [p["name"] for p in resp.get_json()] == ["Mid", "Pricey"]
+
+    resp = client.get("/api/products?available=false")
+    assert [p["name"] for p in resp.get_json()] == ["Pricey"]
+
+
+def test_list_products_bad_params_return_400(client):
+    assert client.get("/api/products?cursor=not-a-cursor").status_code == 400
+
+    huge = products._encode_cursor(10**30)
+    resp = client.get(f"/api/products?cursor={huge}")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "invalid cursor"
+    resp = client.get(f"/api/products/search?q=soap&cursor={huge}")
+    assert resp.status_code == 400
+    assert client.get("/api/products?limit=abc").status_code == 400
+    assert client.get("/api/products?min_price=cheap").status_code == 400
+
+    resp = client.get("/api/products?available=maybe")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "available must be true or false"
+
+
+# -------------------------------------------------
+# Catalog cache
+# -------------------------------------------------
+def test_product_reads_are_cached_until_catalog_changes(client):
+    headers = register_and_login(client)
+    (product_id,) = create_products(
+        client, headers, [{"name": "Cached Tea", "price": 3, "inventory": 1}]
+    )
+
+    first = client.get(f"/api/products/{product_id}", headers=headers)
+    second = client.get(f"/api/products/{product_id}", headers=headers)
+    assert first.data == second.data
+
+    stats = client.get("/api/metrics").get_json()["catalog_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    # A write bumps the catalog version, so the next read sees fresh data
+    resp = client.put(
+        f"/api/products/{product_id}", json={"price": 4}, headers=headers
+    )
+    assert resp.status_code == 200
+
+    resp = client.get(f"/api/products/{product_id}", headers=headers)
+    assert resp.get_json()["price"] == 4
+
+    resp = client.get("/api/products")
+    assert [p["price"] for p in resp.get_json()] == [4]
+
+
+# -------------------------------------------------
+# Conditional requests (ETag / Last-Modified)
+# -------------------------------------------------
+def test_list_products_returns_304_for_matching_etag(client):
+    headers = register_and_login(client)
+    create_products(client, headers, [{"name": "Etag Soap", "price": 2}])
+
+    resp = client.get("/api/products")
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+
+    resp = client.get("/api/products", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.data == b""
+
+
+def test_list_products_revalidates_after_delete(client):
+    headers = register_and_login(client)
+    keep_id, delete_id = create_products(
+        client, headers, [{"name": "Kept", "price": 2}, {"name": "Gone", "price": 3}]
+    )
+
+    resp = client.get("/api/products")
+    etag = resp.headers["ETag"]
+    # No row changes when one is deleted, so lists carry no Last-Modified
+    assert "Last-Modified" not in resp.headers
+
+    client.delete(f"/api/products/{delete_id}", headers=headers)
+
+    resp = client.get(
+        "/api/products",
+        headers={
+            "If-None-Match": etag,
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+        },
+    )
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.get_json()] == [keep_id]
+
+    resp = client.get(
+        "/api/products",
+        headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+    )
+    assert resp.status_code == 200
+
+
+def test_update_product_changes_etag_and_updated_at(client):
+    headers = register_and_login(client)
+    (product_id,) = create_products(client, headers, [{"name": "Jam", "price": 2}])
+
+    resp = client.get(f"/api/products/{product_id}", headers=headers)
+    etag = resp.headers["ETag"]
+    updated_at = resp.get_json()["updated_at"]
+
+    client.put(f"/api/products/{product_id}", json={"price": 3}, headers=headers)
+
+    resp = client.get(
+        f"/api/products/{product_id}",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert resp.get_json()["updated_at"] > updated_at
+
+
+# -------------------------------------------------
+# Storefront detail / category endpoints
+# -------------------------------------------------
+def test_product_detail_is_public_and_cacheable(client):
+    headers = register_and_login(client)
+    (product_id,) = create_products(
+        client, headers, [{"name": "Lip Gloss", "price": 8, "category": "beauty"}]
+    )
+
+    resp = client.get(f"/api/products/{product_id}/detail")
+    assert resp.status_code == 200
+    assert resp.get_json()["category"] == "beauty"
+    assert resp.headers["Cache-Control"] == "public, max-age=300"
+    assert resp.headers["ETag"]
+
+    resp = client.get("/api/products/999999/detail")
+    assert resp.status_code == 404
+
+
+def test_list_category_returns_only_that_category(client):
+    headers = register_and_login(client)
+    create_products(
+        client,
+        headers,
+        [
+            {"name": "Blush", "price": 5, "category": "beauty"},
+            {"name": "Laptop", "price": 900, "category": "laptops"},
+            {"name": "Mascara", "price": 7, "category": "beauty"},
+        ],
+    )
+
+    resp = client.get("/api/products/category/beauty")
+    assert resp.status_code == 200
+    assert [p["name"] for p in resp.get_json()] == ["Blush", "Mascara"]
+    assert resp.headers["Cache-Control"] == "public, max-age=300"
+
+
+# -------------------------------------------------
+# GET /api/products?ids=...  (batch lookup)
+# -------------------------------------------------
+def test_batch_lookup_preserves_order_and_reports_missing(client):
+    headers = register_and_login(client)
+    first, second = create_products(
+        client, headers, [{"name": "Pen", "price": 1}, {"name": "Ink", "price": 2}]
+    )
+
+    # Warm the cache for one of them
+    client.get(f"/api/products/{first}", headers=headers)
+
+    resp = client.get(f"/api/products?ids={second},999999,{first}")
+    assert resp.status_code == 200
+
+    data = resp.get_json()
+    assert [p["name"] for p in data["products"]] == ["Ink", "Pen"]
+    assert data["missing"] == [999999]
+
+
+def test_batch_lookup_rejects_bad_ids(client):
+    resp = client.get("/api/products?ids=1,abc")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "ids must be comma-separated integers"
+
+    too_many = ",".join(str(i) for i in range(1, 102))
+    resp = client.get(f"/api/products?ids={too_many}")
+    assert resp.status_code == 400
+
+    resp = client.get("/api/products?ids=1,99999999999999999999999")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"].startswith("ids must be between")
+
+
+# -------------------------------------------------
+# POST /api/products/bulk  (NDJSON import)
+# -------------------------------------------------
+def ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+def test_bulk_import_requires_jwt(client):
+    resp = client.post("/api/products/bulk", data=ndjson({"name": "A", "price": 1}))
+    assert resp.status_code == 401
+
+
+def test_bulk_import_inserts_in_chunks_and_reports_errors(client):
+    headers = register_and_login(client)
+
+    body = ndjson(
+        {"name": "Bulk 1", "price": 1, "inventory": 3},
+        "{not json",
+        {"name": "Bulk 2", "price": 2},
+        {"price": 3},
+        "",
+        {"name": "Bulk 3", "price": 4, "inventory": "lots"},
+        {"name": "Bulk 4", "price": 5},
+    )
+    resp = client.post(
+        "/api/products/bulk?chunk_size=2",
+        data=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+
+    summary = resp.get_json()
+    assert summary["inserted"] == 3
+    assert summary["failed"] == 3
+    assert summary["errors"] == [
+        {"line": 2, "error": "invalid JSON"},
+        {"line": 4, "error": "name required"},
+        {"line": 6, "error": "inventory should be an integer"},
+    ]
+
+    names = [p["name"] for p in client.get("/api/products").get_json()]
+    assert names == ["Bulk 1", "Bulk 2", "Bulk 4"]
+
+
+def test_bulk_import_rejects_wrongly_typed_rows(client):
+    headers = register_and_login(client)
+
+    body = ndjson(
+        {"name": "Typed 1", "price": 1, "available": False},
+        {"name": 42, "price": 1},
+        {"name": "Bad Description", "price": 1, "description": ["long"]},
+        {"name": "Bad Image", "price": 1, "image_url": {"src": "x.png"}},
+        {"name": "Bad Available", "price": 1, "available": "yes"},
+        {"name": "Typed 2", "price": 2, "description": None},
+    )
+    resp = client.post("/api/products/bulk?chunk_size=10", data=body, headers=headers)
+    assert resp.status_code == 200
+
+    summary = resp.get_json()
+    assert summary["inserted"] == 2
+    assert summary["errors"] == [
+        {"line": 2, "error": "name must be a string"},
+        {"line": 3, "error": "description must be a string"},
+        {"line": 4, "error": "image_url must be a string"},
+        {"line": 5, "error": "available must be true or false"},
+    ]
+
+    names = [p["name"] for p in client.get("/api/products").get_json()]
+    assert names == ["Typed 1", "Typed 2"]
+
+
+def test_bulk_import_upsert_by_name(client):
+    headers = register_and_login(client)
+    (product_id,) = create_products(
+        client, headers, [{"name": "Existing", "price": 1, "inventory": 1}]
+    )
+
+    body = ndjson(
+        {"name": "Existing", "price": 9, "inventory": 7},
+        {"name": "Brand New", "price": 2},
+    )
+    resp = client.post("/api/products/bulk?mode=upsert", data=body, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["inserted"] == 1
+    assert resp.get_json()["updated"] == 1
+
+    resp = client.get(f"/api/products/{product_id}", headers=headers)
+    assert resp.get_json()["price"] == 9
+    assert resp.get_json()["inventory"] == 7
+
+
+def test_bulk_import_upsert_only_updates_given_fields(client):
+    headers = register_and_login(client)
+    plain_id, sharded_id = create_products(
+        client,
+        headers,
+        [
+            {
+                "name": "Plain",
+                "price": 1,
+                "inventory": 50,
+                "description": "Kept",
+                "category": "beauty",
+                "image_url": "plain.png",
+            },
+            {"name": "Sharded", "price": 1, "inventory": 8},
+        ],
+    )
+    shard_product(db.session.get(Product, sharded_id), 2)
+    db.session.commit()
+
+    body = ndjson(
+        {"name": "Plain", "price": 3},
+        {"name": "Sharded", "price": 2, "inventory": 11},
+    )
+    resp = client.post("/api/products/bulk?mode=upsert", data=body, headers=headers)
+    assert resp.get_json()["updated"] == 2
+
+    plain = client.get(f"/api/products/{plain_id}", headers=headers).get_json()
+    assert plain["price"] == 3
+    assert plain["inventory"] == 50
+    assert (plain["description"], plain["category"], plain["image_url"]) == (
+        "Kept",
+        "beauty",
+        "plain.png",
+    )
+
+    # New stock for a sharded product goes through its slots
+    db.session.expire_all()
+    sharded = db.session.get(Product, sharded_id)
+    assert stock_level(sharded) == 11
+    assert sorted(s.quantity for s in sharded.inventory_slots) == [5, 6]
+
+
+def test_bulk_import_rejects_unknown_mode(client):
+    headers = register_and_login(client)
+
+    resp = client.post("/api/products/bulk?mode=replace", data="", headers=headers)
+    assert resp.status_code == 400
+
+
+# -------------------------------------------------
+# Streaming list responses
+# -------------------------------------------------
+def test_list_products_streams_json_array(client, monkeypatch):
+    monkeypatch.setattr(products, "STREAM_BATCH_SIZE", 2)
+    headers = register_and_login(client)
+    ids = create_products(
+        client, headers, [{"name": f"Stream {i}", "price": i} for i in range(5)]
+    )
+
+    resp = client.get("/api/products?stream=1")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert [p["id"] for p in json.loads(resp.data)] == ids
+
+
+def test_list_products_streams_ndjson_with_filters(client):
+    headers = register_and_login(client)
+    create_products(
+        client,
+        headers,
+        [{"name": "Cheap", "price": 1}, {"name": "Dear", "price": 50}],
+    )
+
+    resp = client.get(
+        "/api/products?min_price=10",
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+
+    lines = resp.data.decode().strip().split("\n")
+    assert [json.loads(line)["name"] for line in lines] == ["Dear"]
+
+
+def test_list_products_stream_of_empty_catalog_is_valid_json(client):
+    resp = client.get("/api/products?stream=1")
+    assert json.loads(resp.data) == []
+
+
+# -------------------------------------------------
+# Sparse fields (?fields=...)
+# -------------------------------------------------
+def test_fields_limits_columns_loaded_and_returned(client, app):
+    headers = register_and_login(client)
+    (product_id,) = create_products(
+        client,
+        headers,
+        [{"name": "Sparse", "price": 3, "description": "x" * 500}],
+    )
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        resp = client.get("/api/products?fields=id,name,price")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert resp.status_code == 200
+    assert resp.get_json() == [{"id": product_id, "name": "Sparse", "price": 3.0}]
+    assert not any("products.description" in sql for sql in statements)
+
+    resp = client.get(f"/api/products/{product_id}?fields=name", headers=headers)
+    assert resp.get_json() == {"name": "Sparse"}
+
+    resp = client.get(f"/api/products?ids={product_id}&fields=price")
+    assert resp.get_json()["products"] == [{"price": 3.0}]
+
+
+def test_unknown_fields_are_rejected(client):
+    resp = client.get("/api/products?fields=id,password_hash")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "unknown fields: password_hash"
+
+    resp = client.get("/api/products/1/detail?fields=secret")
+    assert resp.status_code == 400
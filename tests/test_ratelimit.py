@@ -0,0 +1,166 @@
+import threading
+
+import passwords
+from ratelimit import (
+    AuthRateLimiter,
+    MemoryBucketStore,
+    SqliteBucketStore,
+    auth_limiter,
+)
+
+
+def register(client, email, password="Password123!"):
+    resp = client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "security_question": "What is the name of your first pet?",
+            "security_answer": "Fluffy",
+        },
+    )
+    assert resp.status_code == 201
+
+
+def forbid_hashing(monkeypatch):
+    def no_hashing(fn, *args):
+        raise AssertionError("throttled requests must not hash")
+
+    monkeypatch.setattr(passwords.password_hasher, "run", no_hashing)
+
+
+def test_login_throttled_per_account_before_hashing(client, monkeypatch):
+    register(client, "victim@example.com")
+    monkeypatch.setattr(auth_limiter, "account_burst", 2)
+
+    for _ in range(2):
+        resp = client.post(
+            "/auth/login", json={"email": "victim@example.com", "password": "wrong"}
+        )
+        assert resp.status_code == 401
+
+    forbid_hashing(monkeypatch)
+    resp = client.post(
+        "/auth/login", json={"email": "Victim@Example.com", "password": "wrong"}
+    )
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+
+    stats = client.get("/api/metrics").get_json()["auth_rate_limit"]
+    assert stats["throttled_account"] == 1
+    assert stats["allowed"] == 2
+
+
+def test_login_throttled_per_ip(client, monkeypatch):
+    monkeypatch.setattr(auth_limiter, "ip_burst", 3)
+    forbid_hashing(monkeypatch)
+
+    # Different (unknown) accounts from one address share the IP bucket
+    statuses = [
+        client.post(
+            "/auth/login", json={"email": f"nobody{i}@example.com", "password": "x"}
+        ).status_code
+        for i in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+    assert auth_limiter.stats()["throttled_ip"] == 1
+
+    # Another address is unaffected
+    resp = client.post(
+        "/auth/login",
+        json={"email": "nobody@example.com", "password": "x"},
+        environ_base={"REMOTE_ADDR": "10.0.0.2"},
+    )
+    assert resp.status_code == 401
+
+
+def test_forgot_password_is_throttled(client, monkeypatch):
+    monkeypatch.setattr(auth_limiter, "account_burst", 1)
+    payload = {
+        "email": "nobody@example.com",
+        "security_answer": "x",
+        "new_password": "NewPass123!",
+        "confirm_password": "NewPass123!",
+    }
+
+    assert client.post("/auth/forgot-password", json=payload).status_code == 404
+    assert client.post("/auth/forgot-password", json=payload).status_code == 429
+
+    # Login keeps its own buckets
+    resp = client.post(
+        "/auth/login", json={"email": "nobody@example.com", "password": "x"}
+    )
+    assert resp.status_code == 401
+
+
+def test_buckets_refill_over_time(monkeypatch):
+    import ratelimit
+
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+
+    store = MemoryBucketStore()
+    assert store.take("k", rate=1.0, burst=1) == 0
+    assert store.take("k", rate=1.0, burst=1) == 1.0
+
+    now[0] += 1.0
+    assert store.take("k", rate=1.0, burst=1) == 0
+
+
+def test_sqlite_store_is_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    first = AuthRateLimiter()
+    second = AuthRateLimiter()
+    for limiter in (first, second):
+        limiter.store = SqliteBucketStore(path)
+        limiter.ip_burst = 4
+        limiter.ip_rate = 0.001
+
+    results = []
+    lock = threading.Lock()
+
+    def attempt(limiter):
+        retry_after = limiter.check("auth.login", "10.0.0.1")
+        with lock:
+            results.append(retry_after)
+
+    threads = [
+        threading.Thread(target=attempt, args=(limiter,))
+        for limiter in (first, second) * 4
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Both "workers" drew from the same bucket of 4
+    assert sum(1 for r in results if r == 0) == 4
+
+
+def test_ip_bucket_uses_forwarded_client_behind_trusted_proxy(monkeypatch):
+    from app import create_app
+    from extensions import db
+
+    monkeypatch.setenv("TRUSTED_PROXIES", "1")
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    app = create_app()
+    app.config.update(TESTING=True, JWT_SECRET_KEY="test-secret")
+    monkeypatch.setattr(auth_limiter, "ip_burst", 1)
+    forbid_hashing(monkeypatch)
+
+    def login_from(client_ip):
+        return client.post(
+            "/auth/login",
+            json={"email": f"nobody-{client_ip}@example.com", "password": "x"},
+            headers={"X-Forwarded-For": client_ip},
+            environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        ).status_code
+
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        # Every request comes from the proxy; each client gets its own bucket
+        assert login_from("203.0.113.7") == 401
+        assert login_from("198.51.100.4") == 401
+        assert login_from("203.0.113.7") == 429
+        db.session.remove()
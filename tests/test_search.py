@@ -0,0 +1,67 @@
+from extensions import db
+from models import Product
+from search import match_expression, rebuild_search_index, search_products
+
+
+def add_products(*rows):
+    for name, description in rows:
+        db.session.add(Product(name=name, price=1, description=description))
+    db.session.commit()
+
+
+def test_match_expression_quotes_user_input():
+    assert match_expression('red "shoes" OR') == '"red"* "shoes"* "OR"*'
+    assert match_expression("  ***  ") == ""
+
+
+def test_search_ranks_name_matches_first(app):
+    add_products(
+        ("Leather Wallet", "Slim wallet for cards"),
+        ("Phone Case", "Case with a built-in wallet pocket"),
+        ("Desk Lamp", "Bright LED lamp"),
+    )
+
+    results = search_products("wallet", limit=10)
+    assert [p.name for p in results] == ["Leather Wallet", "Phone Case"]
+
+
+def test_search_index_follows_updates_and_deletes(app):
+    add_products(("Green Tea", "Loose leaf tea"))
+    product = Product.query.filter_by(name="Green Tea").first()
+
+    product.name = "Black Coffee"
+    product.description = "Ground coffee"
+    db.session.commit()
+    assert search_products("tea", limit=10) == []
+    assert [p.id for p in search_products("coff", limit=10)] == [product.id]
+
+    db.session.delete(product)
+    db.session.commit()
+    assert search_products("coffee", limit=10) == []
+
+
+def test_rebuild_search_index(app):
+    add_products(("Wool Scarf", "Warm scarf"))
+
+    rebuild_search_index()
+
+    assert [p.name for p in search_products("scarf", limit=10)] == ["Wool Scarf"]
+
+
+def test_search_endpoint_paginates(client, app):
+    add_products(*[(f"Camping Mug {i}", "Enamel mug") for i in range(3)])
+
+    resp = client.get("/api/products/search?q=mug&limit=2")
+    assert resp.status_code == 200
+    assert len(resp.get_json()) == 2
+    cursor = resp.headers["X-Next-Cursor"]
+
+    resp = client.get(f"/api/products/search?q=mug&limit=2&cursor={cursor}")
+    assert len(resp.get_json()) == 1
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_search_endpoint_requires_query(client):
+    resp = client.get("/api/products/search?q=")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "q required"